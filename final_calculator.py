@@ -1,22 +1,84 @@
 import streamlit as st
-import requests
 import re
 import time
+import random
+import traceback
+import zlib
+import hashlib
 import json
+import os
+import tempfile
 import base64
-from Bio.SeqUtils.ProtParam import ProteinAnalysis
+import pathlib
+import numpy as np
+import pandas as pd
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
+# 标准氨基酸及分类
+_AA_LETTERS = 'ACDEFGHIKLMNPQRSTVWY'
+_VALID_AA = frozenset(_AA_LETTERS)
+_HYDROPHOBIC_AA = frozenset('AILMFWVP')
+_POLAR_AA = frozenset('NCQSTY')
+_CHARGED_AA = frozenset('RHKDE')
+
+# 标准氨基酸转换表：小写转为大写，其余字节全部删除
+_KEEP = _AA_LETTERS.encode('ascii')
+_TABLE = bytes.maketrans(_KEEP + _KEEP.lower(), _KEEP + _KEEP)
+_DELETE = bytes(i for i in range(256) if chr(i).upper() not in _VALID_AA)
+
+# 各氨基酸在计数向量中的位置
+_AA_ORDS = np.array([ord(c) for c in _AA_LETTERS], np.intp)
+# 分类掩码：每行对应一个类别（疏水、极性、带电），与计数向量相乘即得各类数量
+_CLASS_MASKS = np.array([
+    [aa in group for aa in _AA_LETTERS]
+    for group in (_HYDROPHOBIC_AA, _POLAR_AA, _CHARGED_AA)
+], np.float64)
+
+# 氨基酸平均分子量 (Da)，与BioPython的IUPACData.protein_weights一致
+_AA_MASSES = np.array([
+    89.0932, 121.1582, 133.1027, 147.1293, 165.1891,  # A C D E F
+    75.0666, 155.1546, 131.1729, 146.1876, 131.1729,  # G H I K L
+    149.2113, 132.1179, 115.1305, 146.1445, 174.201,  # M N P Q R
+    105.0926, 119.1192, 117.1463, 204.2252, 181.1885,  # S T V W Y
+], np.float64)
+_WATER_MASS = 18.0153
+
+# Kyte-Doolittle疏水性标度
+_KD_SCALE = np.array([
+    1.8, 2.5, -3.5, -3.5, 2.8,  # A C D E F
+    -0.4, -3.2, 4.5, -3.9, 3.8,  # G H I K L
+    1.9, -3.5, -1.6, -3.5, -4.5,  # M N P Q R
+    -0.8, -0.7, 4.2, -0.9, -1.3,  # S T V W Y
+], np.float64)
+
+# 等电点计算所用pKa (Bjellqvist方法，与BioPython的IsoelectricPoint一致)
+_POS_IDX = np.array([_AA_LETTERS.index(c) for c in 'KRH'], np.intp)
+_POS_PKA = np.array([10.0, 12.0, 5.98])
+_NEG_IDX = np.array([_AA_LETTERS.index(c) for c in 'DECY'], np.intp)
+_NEG_PKA = np.array([4.05, 4.45, 9.0, 10.0])
+_PKA_NTERM = {'A': 7.59, 'M': 7.0, 'S': 6.93, 'P': 8.36, 'T': 6.82, 'V': 7.44, 'E': 7.7}
+_PKA_CTERM = {'D': 4.55, 'E': 4.75}
+
+# PDB ID (4个字母或数字)
+_PDB_ID_RE = re.compile(r'^[0-9a-zA-Z]{4}\Z')
+
+# FASTA标题行（以>开头的整行）
+_FASTA_HEADER_RE = re.compile(r'^>[^\n]*\n?', re.MULTILINE)
 
 # 工具函数
 def clean_sequence(sequence):
     """清理序列"""
-    cleaned = ''.join([char for char in sequence.upper() if char.isalpha()])
-    valid_aa = set('ACDEFGHIKLMNPQRSTVWY')
-    
-    # 只保留标准氨基酸
-    cleaned = ''.join([aa for aa in cleaned if aa in valid_aa])
-    
-    return cleaned
+    # 只保留标准氨基酸，一次translate完成大小写转换和过滤
+    return sequence.encode('ascii', 'ignore').translate(_TABLE, delete=_DELETE).decode('ascii')
 
+@st.cache_data(show_spinner=False, max_entries=512)
 def extract_sequence_from_input(input_str):
     """从输入文本中提取氨基酸序列或PDB ID"""
     if not input_str:
@@ -25,47 +87,84 @@ def extract_sequence_from_input(input_str):
     stripped_input = input_str.strip()
     
     # 检查是否为PDB ID (4个字符)
-    if re.match(r'^[0-9a-zA-Z]{4}$', stripped_input):
+    if _PDB_ID_RE.match(stripped_input):
         return stripped_input
     
-    sequence_parts = []
-    
-    if input_str.startswith('>'):
-        lines = input_str.split('\n')
-        # 处理FASTA格式：跳过标题行，只处理后续行
-        for line in lines[1:]:
-            if line:
-                sequence_parts.append(line)
-    else:
-        # 不是FASTA格式，直接处理整个字符串
-        sequence_parts.append(input_str)
-    
-    sequence_content = ''.join(sequence_parts)
+    # 处理FASTA格式：一次正则替换去掉所有标题行，其余内容交给clean_sequence
+    sequence_content = _FASTA_HEADER_RE.sub('', input_str)
     return clean_sequence(sequence_content)
 
-def analyze_sequence(sequence):
-    prot = ProteinAnalysis(sequence)
+def _pi_kernel(pos_count, pos_pka, neg_count, neg_pka):
+    """用二分法求净电荷为零时的pH（安装numba时会被编译为本地代码）"""
+    # 与BioPython相同的起点、区间和精度，保证结果一致
+    pH, min_pH, max_pH = 7.775, 4.05, 12.0
+    while max_pH - min_pH > 0.0001:
+        # Henderson-Hasselbalch方程计算各基团的部分电荷
+        positive_charge = 0.0
+        for k in range(pos_count.shape[0]):
+            positive_charge += pos_count[k] / (10.0 ** (pH - pos_pka[k]) + 1.0)
+        negative_charge = 0.0
+        for k in range(neg_count.shape[0]):
+            negative_charge += neg_count[k] / (10.0 ** (neg_pka[k] - pH) + 1.0)
+        if positive_charge - negative_charge > 0.0:
+            min_pH = pH
+        else:
+            max_pH = pH
+        pH = (min_pH + max_pH) / 2
+    return pH
+
+@st.cache_resource(show_spinner=False)
+def _load_pi_kernel():
+    """编译等电点计算内核，每个进程只编译一次"""
+    try:
+        from numba import njit
+    except ImportError:  # 未安装numba时直接使用Python实现
+        return _pi_kernel
+    try:
+        kernel = njit(cache=True)(_pi_kernel)
+        # 预热：触发编译，避免第一次分析时等待
+        kernel(np.ones(4), np.append(_POS_PKA, 7.5), np.ones(5), np.append(_NEG_PKA, 3.55))
+    except Exception:
+        # 编译失败（如编译缓存损坏）时退回Python实现
+        return _pi_kernel
+    return kernel
+
+_pi_bisect = _load_pi_kernel()
+
+def _isoelectric_point(counts, nterm, cterm):
+    """计算等电点"""
+    # 末端基团各计一个，pKa随末端氨基酸调整
+    pos_count = np.append(counts[_POS_IDX], 1.0)
+    pos_pka = np.append(_POS_PKA, _PKA_NTERM.get(nterm, 7.5))
+    neg_count = np.append(counts[_NEG_IDX], 1.0)
+    neg_pka = np.append(_NEG_PKA, _PKA_CTERM.get(cterm, 3.55))
+    return _pi_bisect(pos_count, pos_pka, neg_count, neg_pka)
+
+def _metrics_from_counts(counts, nterm, cterm):
+    """根据氨基酸计数向量及首尾氨基酸计算理化性质"""
+    length = int(counts.sum())
     
     # 计算各项指标
-    mw_da = prot.molecular_weight()
+    mw_da = float(counts @ _AA_MASSES) - (length - 1) * _WATER_MASS
     mw_kda = mw_da / 1000
-    pI = prot.isoelectric_point()
+    pI = _isoelectric_point(counts, nterm, cterm)
     
     # 消光系数计算
     # 获取原始消光系数 (M⁻¹cm⁻¹)
-    ext_no_cys = prot.molar_extinction_coefficient()[0]  # 无二硫键
-    ext_with_cys = prot.molar_extinction_coefficient()[1]  # 有二硫键
+    n_trp, n_tyr, n_cys = (int(counts[_AA_LETTERS.index(aa)]) for aa in 'WYC')
+    ext_no_cys = n_trp * 5500 + n_tyr * 1490  # 无二硫键
+    ext_with_cys = ext_no_cys + (n_cys // 2) * 125  # 有二硫键
     
     # 计算Abs 0.1% (=1 g/L)的值
     # 正确公式：Abs 0.1% = 消光系数 / 分子量 × 1000
     abs_no_cys = ext_no_cys / mw_da  # 无二硫键
     abs_with_cys = ext_with_cys / mw_da # 有二硫键
     
-    gravy = prot.gravy()
-    aa_comp = prot.get_amino_acids_percent()
+    gravy = float(counts @ _KD_SCALE) / length
+    aa_comp = dict(zip(_AA_LETTERS, (counts / length).tolist()))
     
     return {
-        'length': len(sequence),
+        'length': length,
         'mw_da': mw_da,
         'mw_kda': mw_kda,
         'pI': pI,
@@ -75,9 +174,146 @@ def analyze_sequence(sequence):
         'abs_with_cys': abs_with_cys,
         'gravy': gravy,
         'aa_comp': aa_comp,
-        'sequence': sequence
+        'counts': counts
     }
 
+@st.cache_data(show_spinner=False, max_entries=512)
+def analyze_sequence(sequence):
+    """分析序列的理化性质（相同序列直接复用缓存结果）"""
+    # 氨基酸计数：一次bincount统计所有字符，再按字母表取出20种氨基酸
+    counts = np.bincount(np.frombuffer(sequence.encode('ascii'), np.uint8), minlength=128)[_AA_ORDS]
+    result = _metrics_from_counts(counts, sequence[0], sequence[-1])
+    result['sequence'] = sequence
+    return result
+
+def is_valid_pdb_id(pdb_id):
+    """验证PDB ID格式"""
+    return bool(_PDB_ID_RE.match(pdb_id))
+
+@st.cache_resource(show_spinner=False)
+def _get_http_session():
+    """创建带连接池和自动重试的HTTP会话，所有脚本重跑共用同一个"""
+    # 延迟导入：只有真正联网时才加载requests
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=3, backoff_factor=0.3))
+    session.mount('https://', adapter)
+    return session
+
+# PDB序列的本地磁盘缓存目录
+_PDB_CACHE_DIR = pathlib.Path.home() / '.cache' / 'protein_calc' / 'pdb'
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _pdb_sequence(pdb_id_upper):
+    """下载并解析PDB条目的序列，优先读取本地磁盘缓存"""
+    cache_file = _PDB_CACHE_DIR / f"{pdb_id_upper}.fasta"
+    if cache_file.exists():
+        try:
+            # 去掉所有标题行，剩余的空白和非标准字符由清理查表一次性删除
+            sequence = clean_sequence(_FASTA_HEADER_RE.sub('', cache_file.read_text()))
+        except OSError:
+            sequence = ''
+        if sequence:
+            return sequence
+        # 空文件或解析不出序列（如写入被中断）视为未命中，删除后重新下载
+        try:
+            cache_file.unlink()
+        except OSError:
+            pass
+    
+    fasta_url = f"https://www.rcsb.org/fasta/entry/{pdb_id_upper}/download"
+    response = _get_http_session().get(fasta_url, timeout=10)
+    response.raise_for_status()
+    fasta_text = response.text
+    sequence = clean_sequence(_FASTA_HEADER_RE.sub('', fasta_text))
+    
+    # 同一PDB ID的FASTA内容不会变化，保存到磁盘供之后的会话使用；
+    # 先写入同目录的临时文件再原子替换，其他会话不会读到写了一半的文件
+    if sequence:
+        tmp_path = None
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=cache_file.parent, suffix='.tmp', delete=False) as tmp:
+                tmp_path = tmp.name
+                tmp.write(fasta_text)
+            os.chmod(tmp_path, 0o644)  # 临时文件默认仅本用户可读，恢复为普通缓存文件的权限
+            os.replace(tmp_path, cache_file)
+        except OSError:
+            # 缓存写入失败不影响本次结果
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+    return sequence
+
+def clear_pdb_cache():
+    """清空PDB序列的内存缓存和磁盘缓存，之后的查询会重新下载"""
+    _pdb_sequence.clear()
+    for cache_file in _PDB_CACHE_DIR.glob('*.fasta'):
+        try:
+            cache_file.unlink()
+        except OSError:
+            pass
+
+def _lookup_pdb_sequence(pdb_id):
+    """从PDB获取序列，返回 (序列, 错误信息)；不直接输出界面元素，可在工作线程中调用"""
+    if not is_valid_pdb_id(pdb_id):
+        return None, f"{pdb_id} 不是有效的PDB ID"
+    
+    try:
+        return _pdb_sequence(pdb_id.upper()), None
+    except Exception as e:
+        # 只在出错时导入异常类型判断是否为下载失败；缓存命中时不会加载requests
+        from requests.exceptions import RequestException
+        if not isinstance(e, RequestException):
+            raise
+        return None, f"PDB序列下载失败: {e}"
+
+def get_sequence_from_pdb(pdb_id):
+    """从PDB获取序列"""
+    sequence, error_message = _lookup_pdb_sequence(pdb_id)
+    if error_message:
+        st.error(error_message)
+    return sequence
+
+def _resolve_and_analyze(seq_input):
+    """提取输入中的序列（PDB ID则下载其序列），并预先计算理化性质；返回 (序列, 错误信息)"""
+    sequence = extract_sequence_from_input(seq_input)
+    error_message = None
+    if sequence and _PDB_ID_RE.match(sequence):
+        sequence, error_message = _lookup_pdb_sequence(sequence)
+    if sequence:
+        analyze_sequence(sequence)  # 结果进入缓存，显示时直接读取
+    return sequence, error_message
+
+# 指标卡片HTML模板：整组卡片拼接后一次性输出
+_METRIC_GRID_TMPL = '<div style="display: grid; grid-template-columns: repeat({columns}, 1fr);">{boxes}</div>'
+_AA_BOX_TMPL = (
+    '<div class="metric-box">'
+    '<p style="font-size: 1.2rem; font-weight: bold; margin-bottom: 5px;">{aa}</p>'
+    '<p style="margin: 0; color: #333;">{pct:.1%}</p>'
+    '</div>'
+)
+_CATEGORY_BOX_TMPL = (
+    '<div class="metric-box">'
+    '<p style="margin: 0; color: #666;">{label}</p>'
+    '<p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{pct:.1%}</p>'
+    '</div>'
+)
+
+# 结构质量指标的显示名称
+_METRIC_DISPLAY = {
+    'plddt': 'pLDDT评分',
+    'tm_score': 'TM-Score',
+    'rmsd': 'RMSD (Å)',
+    'total_time_seconds': '总时间 (秒)',
+    'model_inference_time_seconds': '推理时间 (秒)'
+}
+
 def display_physicochemical_properties(result):
     """显示理化性质分析结果"""
     col1, col2 = st.columns(2)
@@ -110,67 +346,29 @@ def display_physicochemical_properties(result):
     # 氨基酸组成分析
     st.markdown("### 氨基酸组成分析")
     
-    # 获取氨基酸组成并排序
-    aa_comp = result['aa_comp']
-    # 按照百分比从高到低排序
-    sorted_aa = sorted(aa_comp.items(), key=lambda x: x[1], reverse=True)
+    # 选出丰度最高的10个氨基酸：按数量从高到低，数量相同时按字母顺序
+    counts = result['counts']
+    sort_keys = -counts * len(_AA_LETTERS) + np.arange(len(_AA_LETTERS))
+    top_idx = np.argpartition(sort_keys, 10)[:10]
+    top_idx = top_idx[np.argsort(sort_keys[top_idx])]
     
     # 显示前10个最丰富的氨基酸
     st.markdown("#### 主要氨基酸（按丰度排序）")
-    cols = st.columns(5)
-    for j, (aa, percentage) in enumerate(sorted_aa[:10]):
-        with cols[j % 5]:
-            st.markdown(
-                f"""
-                <div class="metric-box">
-                    <p style="font-size: 1.2rem; font-weight: bold; margin-bottom: 5px;">{aa}</p>
-                    <p style="margin: 0; color: #333;">{percentage:.1%}</p>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    aa_boxes = ''.join(
+        _AA_BOX_TMPL.format(aa=_AA_LETTERS[i], pct=counts[i] / result['length']) for i in top_idx
+    )
+    st.markdown(_METRIC_GRID_TMPL.format(columns=5, boxes=aa_boxes), unsafe_allow_html=True)
     
     # 显示疏水性和极性氨基酸统计
-    hydrophobic = set(['A', 'I', 'L', 'M', 'F', 'W', 'V', 'P'])
-    polar = set(['N', 'C', 'Q', 'S', 'T', 'Y'])
-    charged = set(['R', 'H', 'K', 'D', 'E'])
-    
-    hydrophobic_count = sum(aa_comp.get(aa, 0) for aa in hydrophobic)
-    polar_count = sum(aa_comp.get(aa, 0) for aa in polar)
-    charged_count = sum(aa_comp.get(aa, 0) for aa in charged)
+    hydrophobic_count, polar_count, charged_count = _CLASS_MASKS @ counts / result['length']
     
     st.markdown("#### 氨基酸分类统计")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(
-            f"""
-            <div class="metric-box">
-                <p style="margin: 0; color: #666;">疏水性氨基酸</p>
-                <p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{hydrophobic_count:.1%}</p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-    with col2:
-        st.markdown(
-            f"""
-            <div class="metric-box">
-                <p style="margin: 0; color: #666;">极性氨基酸</p>
-                <p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{polar_count:.1%}</p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-    with col3:
-        st.markdown(
-            f"""
-            <div class="metric-box">
-                <p style="margin: 0; color: #666;">带电氨基酸</p>
-                <p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{charged_count:.1%}</p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+    category_boxes = ''.join([
+        _CATEGORY_BOX_TMPL.format(label="疏水性氨基酸", pct=hydrophobic_count),
+        _CATEGORY_BOX_TMPL.format(label="极性氨基酸", pct=polar_count),
+        _CATEGORY_BOX_TMPL.format(label="带电氨基酸", pct=charged_count),
+    ])
+    st.markdown(_METRIC_GRID_TMPL.format(columns=3, boxes=category_boxes), unsafe_allow_html=True)
 
 # 设置页面配置
 st.set_page_config(
@@ -227,15 +425,13 @@ st.markdown('<div class="main-header">🧬 蛋白质理化性质分析工具</di
 if 'prediction_status' not in st.session_state:
     st.session_state.prediction_status = []
 if 'prediction_results' not in st.session_state:
-    st.session_state.prediction_results = []
+    st.session_state.prediction_results = {}
+if 'pending_task_indices' not in st.session_state:
+    st.session_state.pending_task_indices = set()
 if 'api_settings' not in st.session_state:
     st.session_state.api_settings = {'use_api': False}
-if 'last_analysis_result' not in st.session_state:
-    st.session_state.last_analysis_result = None
-if 'current_analysis_index' not in st.session_state:
-    st.session_state.current_analysis_index = 0
-if 'analysis_info' not in st.session_state:
-    st.session_state.analysis_info = ""
+if 'analyzed_sequences' not in st.session_state:
+    st.session_state.analyzed_sequences = []
 
 # 侧边栏
 with st.sidebar:
@@ -270,9 +466,16 @@ with st.sidebar:
     st.markdown("""
     > **提示**: 管理员可修改代码中的API密钥配置
     """)
+    st.checkbox("记录详细调试信息", key="debug_enabled",
+                help="记录API响应的详细结构，便于排查问题")
+    
+    st.header("🗂️ 缓存")
+    if st.button("刷新PDB序列缓存", key="clear_pdb_cache"):
+        clear_pdb_cache()
+        st.success("已清空PDB序列缓存")
     
     st.header("🔗 关于")
-    st.markdown("基于Python和BioPython开发的蛋白质分析与结构预测工具")
+    st.markdown("基于Python和NumPy开发的蛋白质分析与结构预测工具")
 
 # 主界面 - 输入方式选择
 input_method = st.radio(
@@ -287,6 +490,109 @@ if 'sequences' not in st.session_state:
     st.session_state.sequences = [""]
 # 确保预测状态和结果列表与序列列表长度一致 - 移至序列处理时统一处理
 
+def _format_debug_records(records, limit=500):
+    """显示时才把 (格式串, 参数) 调试记录格式化为文本，过长的参数（如错误堆栈）截断"""
+    return [
+        fmt % tuple(arg[:limit] + "..." if isinstance(arg, str) and len(arg) > limit else arg for arg in args)
+        if args else fmt
+        for fmt, args in records
+    ]
+
+@st.fragment
+def render_sequence_row(i):
+    """渲染单个序列的输入框、状态和预测按钮；编辑序列时只重跑这一行"""
+    # 序列标题
+    st.markdown(f"### 🧬 序列 {i+1}")
+    col1, col2 = st.columns([10, 1])
+    with col1:
+        st.session_state.sequences[i] = st.text_area(
+            f"序列输入:",
+            value=st.session_state.sequences[i],
+            height=100,
+            placeholder="请输入氨基酸序列或FASTA格式...",
+            key=f"seq_input_{i}"
+        )
+    with col2:
+        if i > 0:  # 不允许删除第一个序列框
+            if st.button(f"🗑️", key=f"remove_seq_{i}"):
+                del st.session_state.sequences[i]
+                # 清理相关的预测状态，后续序列的结果索引前移一位，结果中记录的序列索引同步更新
+                if i < len(st.session_state.prediction_status):
+                    del st.session_state.prediction_status[i]
+                st.session_state.prediction_results = {
+                    k - (k > i): dict(v, sequence_index=k - 1) if k > i and v else v
+                    for k, v in st.session_state.prediction_results.items()
+                    if k != i
+                }
+                st.session_state.pending_task_indices = {
+                    k - (k > i) for k in st.session_state.pending_task_indices if k != i
+                }
+                # 输入框状态按位置保存，清掉被删行及其后各行的状态，重跑时按前移后的序列重新填充
+                for k in range(i, len(st.session_state.sequences) + 1):
+                    st.session_state.pop(f"seq_input_{k}", None)
+                st.rerun()
+
+    # 显示预测状态
+    col_status = st.columns([1])[0]
+    with col_status:
+        if i in st.session_state.prediction_status:
+            if st.session_state.prediction_status[i] == "running":
+                st.info("🔄 预测正在进行中...")
+            elif st.session_state.prediction_status[i] == "completed":
+                st.success("✅ 预测完成!")
+            elif st.session_state.prediction_status[i] == "error":
+                st.error("❌ 预测失败")
+    
+    # 大红色按钮行（只保留预测按钮样式）
+    st.markdown(f"""<style>
+        div[data-testid="stButton"]:has(button[data-testid="button-predict_seq_{i}"]) button {{
+            background-color: #e74c3c;
+            color: white;
+            font-size: 1.1rem;
+            font-weight: bold;
+            padding: 12px 24px;
+            border-radius: 8px;
+            border: none;
+            width: 100%;
+        }}
+        div[data-testid="stButton"]:has(button[data-testid="button-predict_seq_{i}"]) button:hover {{
+            background-color: #c0392b;
+            color: white;
+        }}
+    </style>""", unsafe_allow_html=True)
+    
+    # 结构预测按钮
+    if st.button(f"🧬 预测结构", key=f"predict_seq_{i}"):
+        original_sequence = st.session_state.sequences[i]
+        sequence = extract_sequence_from_input(original_sequence)
+        
+        # 添加调试信息：只保存 (格式串, 参数) 记录，显示时才格式化
+        debug_info = []
+        if st.session_state.get('debug_enabled', False):
+            debug_info.append(("原始序列 %d: %s", (i + 1, original_sequence)))
+            debug_info.append(("清理后序列 %d: %s", (i + 1, sequence)))
+            debug_info.append(("序列长度 %d: %d", (i + 1, len(sequence))))
+        
+        st.session_state.debug_info = debug_info
+        
+        if not sequence:
+            st.warning(f"序列 {i+1}：请先输入有效的氨基酸序列")
+        elif not _PDB_ID_RE.match(sequence) and len(sequence) < 10:
+            st.warning(f"序列 {i+1}：序列太短，至少需要10个氨基酸，当前长度为 {len(sequence)}")
+        else:
+            # Initialize prediction_status and prediction_results if not exists
+            if 'prediction_status' not in st.session_state:
+                st.session_state.prediction_status = []
+            if 'prediction_results' not in st.session_state:
+                st.session_state.prediction_results = {}
+            # 确保预测状态列表长度与序列列表一致
+            while len(st.session_state.prediction_status) < len(st.session_state.sequences):
+                st.session_state.prediction_status.append("idle")
+            # 开始预测
+            st.session_state.prediction_status[i] = "running"
+            st.session_state.pending_task_indices.add(i)
+            st.rerun()
+
 # 输入区域
 if input_method == "通过PDB ID分析":
     col1, col2 = st.columns([1, 3])
@@ -327,105 +633,17 @@ else:
     # 初始化分析相关状态
     if 'run_analysis' not in st.session_state:
         st.session_state.run_analysis = False
-    if 'current_analysis_index' not in st.session_state:
-        st.session_state.current_analysis_index = 0
-    if 'last_analysis_result' not in st.session_state:
-        st.session_state.last_analysis_result = None
-    if 'analysis_info' not in st.session_state:
-        st.session_state.analysis_info = ""
     
     # API设置已移除，默认使用API调用
     
     # 显示所有序列框
     for i in range(len(st.session_state.sequences)):
-        # 序列标题
-        st.markdown(f"### 🧬 序列 {i+1}")
-        col1, col2 = st.columns([10, 1])
-        with col1:
-            st.session_state.sequences[i] = st.text_area(
-                f"序列输入:",
-                value=st.session_state.sequences[i],
-                height=100,
-                placeholder="请输入氨基酸序列或FASTA格式...",
-                key=f"seq_input_{i}"
-            )
-        with col2:
-            if i > 0:  # 不允许删除第一个序列框
-                if st.button(f"🗑️", key=f"remove_seq_{i}"):
-                    del st.session_state.sequences[i]
-                    # 清理相关的预测状态
-                    if i in st.session_state.prediction_status:
-                        del st.session_state.prediction_status[i]
-                    if i in st.session_state.prediction_results:
-                        del st.session_state.prediction_results[i]
-                    st.rerun()
-    
-        # 显示预测状态
-        col_status = st.columns([1])[0]
-        with col_status:
-            if i in st.session_state.prediction_status:
-                if st.session_state.prediction_status[i] == "running":
-                    st.info("🔄 预测正在进行中...")
-                elif st.session_state.prediction_status[i] == "completed":
-                    st.success("✅ 预测完成!")
-                elif st.session_state.prediction_status[i] == "error":
-                    st.error("❌ 预测失败")
-        
-        # 大红色按钮行（只保留预测按钮样式）
-        st.markdown(f"""<style>
-            div[data-testid="stButton"]:has(button[data-testid="button-predict_seq_{i}"]) button {{
-                background-color: #e74c3c;
-                color: white;
-                font-size: 1.1rem;
-                font-weight: bold;
-                padding: 12px 24px;
-                border-radius: 8px;
-                border: none;
-                width: 100%;
-            }}
-            div[data-testid="stButton"]:has(button[data-testid="button-predict_seq_{i}"]) button:hover {{
-                background-color: #c0392b;
-                color: white;
-            }}
-        </style>""", unsafe_allow_html=True)
-        
-        # 结构预测按钮
-        if st.button(f"🧬 预测结构", key=f"predict_seq_{i}"):
-            original_sequence = st.session_state.sequences[i]
-            sequence = extract_sequence_from_input(original_sequence)
-            
-            # 添加调试信息
-            debug_info = []
-            debug_info.append(f"原始序列 {i+1}: {original_sequence}")
-            debug_info.append(f"清理后序列 {i+1}: {sequence}")
-            debug_info.append(f"序列长度 {i+1}: {len(sequence)}")
-            
-            st.session_state.debug_info = debug_info
-            
-            if not sequence:
-                st.warning(f"序列 {i+1}：请先输入有效的氨基酸序列")
-            elif not re.match(r'^[0-9a-zA-Z]{4}$', sequence) and len(sequence) < 10:
-                st.warning(f"序列 {i+1}：序列太短，至少需要10个氨基酸，当前长度为 {len(sequence)}")
-            else:
-                # Initialize prediction_status and prediction_results if not exists
-                if 'prediction_status' not in st.session_state:
-                    st.session_state.prediction_status = []
-                if 'prediction_results' not in st.session_state:
-                    st.session_state.prediction_results = []
-                # 确保预测状态列表长度与序列列表一致
-                while len(st.session_state.prediction_status) < len(st.session_state.sequences):
-                    st.session_state.prediction_status.append("idle")
-                # 确保预测结果列表长度与序列列表一致
-                while len(st.session_state.prediction_results) < len(st.session_state.sequences):
-                    st.session_state.prediction_results.append({})
-                # 开始预测
-                st.session_state.prediction_status[i] = "running"
-                st.rerun()
+        render_sequence_row(i)
         
         # 显示调试信息（如果有）
     if 'debug_info' in st.session_state and st.session_state.debug_info:
         with st.expander("调试信息", expanded=False):
-            st.markdown("\n".join(st.session_state.debug_info))
+            st.markdown("\n".join(_format_debug_records(st.session_state.debug_info)))
 
     # 显示预测状态
     if 'prediction_status' in st.session_state:
@@ -440,177 +658,18 @@ else:
         elif status == "error":
             st.markdown("❌ **预测失败**")
             
-            if 'prediction_results' in st.session_state and i < len(st.session_state.prediction_results):
-                result = st.session_state.prediction_results[i]
-                if 'error' in result:
-                    st.error(f"错误原因: {result['error']}")
+            result = st.session_state.get('prediction_results', {}).get(i)
+            if result and 'error' in result:
+                st.error(f"错误原因: {result['error']}")
         
         # 额外的错误信息检查，确保错误总是可见
-        if status == "error" and 'prediction_results' in st.session_state and i < len(st.session_state.prediction_results):
-            result = st.session_state.prediction_results[i]
-            if 'error' in result:
+        if status == "error":
+            result = st.session_state.get('prediction_results', {}).get(i)
+            if result and 'error' in result:
                 st.error(f"错误原因: {result['error']}")
     
-    # 显示分析结果（如果有）
-    if st.session_state.last_analysis_result is not None and st.session_state.get('current_analysis_index') == i:
-        with st.expander(f"📊 {st.session_state.analysis_info}", expanded=True):
-            result = st.session_state.last_analysis_result
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("### 基本信息")
-                st.markdown(f"**序列长度**: {result['length']} 个氨基酸")
-                st.markdown(f"**分子量**: {result['mw_kda']:.2f} kDa ({result['mw_da']:.0f} Da)")
-                st.markdown(f"**等电点(pI)**: {result['pI']:.2f}")
-                st.markdown(f"**平均疏水性(GRAVY)**: {result['gravy']:.3f}")
-                
-                # 解释疏水性
-                if result['gravy'] > 0.5:
-                    hydrophobicity = "强疏水性"
-                elif result['gravy'] > 0:
-                    hydrophobicity = "弱疏水性"
-                elif result['gravy'] > -0.5:
-                    hydrophobicity = "弱亲水性"
-                else:
-                    hydrophobicity = "强亲水性"
-                st.markdown(f"**疏水性描述**: {hydrophobicity}")
-            
-            with col2:
-                st.markdown("### 消光系数")
-                st.markdown(f"**无二硫键**: {result['ext_no_cys']:.0f} M⁻¹cm⁻¹")
-                st.markdown(f"**有二硫键**: {result['ext_with_cys']:.0f} M⁻¹cm⁻¹")
-                st.markdown(f"**Abs 0.1% (1 mg/ml) - 无二硫键**: {result['abs_no_cys']:.3f}")
-                st.markdown(f"**Abs 0.1% (1 mg/ml) - 有二硫键**: {result['abs_with_cys']:.3f}")
-            
-            # 氨基酸组成分析
-            st.markdown("### 氨基酸组成分析")
-            
-            # 获取氨基酸组成并排序
-            aa_comp = result['aa_comp']
-            # 按照百分比从高到低排序
-            sorted_aa = sorted(aa_comp.items(), key=lambda x: x[1], reverse=True)
-            
-            # 显示前10个最丰富的氨基酸
-            st.markdown("#### 主要氨基酸（按丰度排序）")
-            cols = st.columns(5)
-            for j, (aa, percentage) in enumerate(sorted_aa[:10]):
-                with cols[j % 5]:
-                    st.markdown(
-                        f"""
-                        <div class="metric-box">
-                            <p style="font-size: 1.2rem; font-weight: bold; margin-bottom: 5px;">{aa}</p>
-                            <p style="margin: 0; color: #333;">{percentage:.1%}</p>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-            
-            # 显示疏水性和极性氨基酸统计
-            hydrophobic = set(['A', 'I', 'L', 'M', 'F', 'W', 'V', 'P'])
-            polar = set(['N', 'C', 'Q', 'S', 'T', 'Y'])
-            charged = set(['R', 'H', 'K', 'D', 'E'])
-            
-            hydrophobic_count = sum(aa_comp.get(aa, 0) for aa in hydrophobic)
-            polar_count = sum(aa_comp.get(aa, 0) for aa in polar)
-            charged_count = sum(aa_comp.get(aa, 0) for aa in charged)
-            
-            st.markdown("#### 氨基酸分类统计")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.markdown(
-                    f"""
-                    <div class="metric-box">
-                        <p style="margin: 0; color: #666;">疏水性氨基酸</p>
-                        <p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{hydrophobic_count:.1%}</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            with col2:
-                st.markdown(
-                    f"""
-                    <div class="metric-box">
-                        <p style="margin: 0; color: #666;">极性氨基酸</p>
-                        <p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{polar_count:.1%}</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            with col3:
-                st.markdown(
-                    f"""
-                    <div class="metric-box">
-                        <p style="margin: 0; color: #666;">带电氨基酸</p>
-                        <p style="font-size: 1.2rem; font-weight: bold; margin: 5px 0;">{charged_count:.1%}</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            
     st.markdown("---")
     
-    # 显示预测结果
-    if i in st.session_state.prediction_results:
-        result = st.session_state.prediction_results[i]
-        with st.expander("📊 预测结果详情", expanded=True):
-                # 基本信息
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown(f"**预测置信度**: {result.get('confidence', 'N/A')}")
-                    st.markdown(f"**预测时间**: {result.get('time', 'N/A')}")
-                    if 'simulation' in result and result['simulation']:
-                        st.info("📝 这是模拟数据，仅供演示使用")
-                
-                with col2:
-                    # 显示结构质量指标（如果有）
-                    if 'metrics' in result and result['metrics']:
-                        st.markdown("**结构质量指标**:")
-                        for metric_name, metric_value in result['metrics'].items():
-                            metric_display = {
-                                'plddt': 'pLDDT评分',
-                                'tm_score': 'TM-Score',
-                                'rmsd': 'RMSD (Å)'
-                            }
-                            st.markdown(f"- {metric_display.get(metric_name, metric_name)}: {metric_value}")
-                
-                # 提供结构文件下载
-                if 'structure_data' in result and 'content' in result['structure_data'] and result['structure_data']['content']:
-                    structure_content = result['structure_data']['content']
-                    structure_format = result['structure_data'].get('format', 'pdb')
-                    structure_id = result['structure_data'].get('structure_id', f'structure_{i+1}')
-                    
-                    # 根据格式设置文件扩展名和MIME类型
-                    if structure_format.lower() == 'mmcif':
-                        file_extension = 'cif'
-                        mime_type = 'chemical/x-mmcif'
-                        label = "💾 下载mmCIF文件"
-                    else:  # 默认使用pdb
-                        file_extension = 'pdb'
-                        mime_type = 'chemical/x-pdb'
-                        label = "💾 下载PDB文件"
-                    
-                    # 创建临时文件以下载
-                    st.download_button(
-                        label=label,
-                        data=structure_content,
-                        file_name=f"{structure_id}.{file_extension}",
-                        mime=mime_type,
-                        key=f"download_structure_{i}"
-                    )
-                    
-                    # 简单的结构信息
-                    atom_count = structure_content.count('ATOM')
-                    st.markdown(f"**结构信息**: 包含 {atom_count} 个原子")
-                    
-                    # 提供结构可视化提示
-                    st.markdown("""
-                    **结构可视化提示**:
-                    - 下载PDB文件后可使用PyMOL、UCSF、Chimera等工具查看
-                    - 也可上传至 [RCSB 3D Viewer](https://rcsb.org/3d-view) 在线查看
-                    """)
-        
-        st.markdown("---")
-    
     # 添加序列按钮
     if st.button("➕ 添加序列", key="add_seq_main"):
         st.session_state.sequences.append("")
@@ -639,15 +698,17 @@ else:
             # 验证所有序列
             all_valid = True
             debug_info = []
+            debug_enabled = st.session_state.get('debug_enabled', False)
             for i, seq_input in enumerate(st.session_state.sequences):
                 sequence = extract_sequence_from_input(seq_input)
-                debug_info.append(f"原始输入序列 {i+1}: {seq_input}")
-                debug_info.append(f"提取后序列 {i+1}: {sequence}")
-                debug_info.append(f"提取后长度 {i+1}: {len(sequence)}")
+                if debug_enabled:
+                    debug_info.append(("原始输入序列 %d: %s", (i + 1, seq_input)))
+                    debug_info.append(("提取后序列 %d: %s", (i + 1, sequence)))
+                    debug_info.append(("提取后长度 %d: %d", (i + 1, len(sequence))))
                 if not sequence:
                     st.warning(f"序列 {i+1} 为空，请输入有效序列")
                     all_valid = False
-                elif not re.match(r'^[0-9a-zA-Z]{4}$', sequence) and len(sequence) < 10:
+                elif not _PDB_ID_RE.match(sequence) and len(sequence) < 10:
                     st.warning(f"序列 {i+1} 太短，至少需要10个氨基酸，当前长度为 {len(sequence)}")
                     all_valid = False
             
@@ -661,6 +722,7 @@ else:
                 # 设置所有序列的预测状态为运行中
                 for i in range(len(st.session_state.sequences)):
                     st.session_state.prediction_status[i] = "running"
+                st.session_state.pending_task_indices.update(range(len(st.session_state.sequences)))
                 st.rerun()
 
 # 示例序列处理（保持兼容性）
@@ -690,50 +752,42 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 if st.button("🧪 分析所有输入序列的理化性质", key="analyze_all_bottom"):
-    merged_sequence = ""
-    valid_sequences_found = False
-    individual_results = []  # 存储单独结果
-
-    for i in range(len(st.session_state.sequences)):
-        sequence = extract_sequence_from_input(st.session_state.sequences[i])
-        if sequence:
-            valid_sequences_found = True
-            merged_sequence += sequence  # 合并所有有效序列
-            
-            # 单独计算并保存结果
-            single_result = analyze_sequence(sequence)
-            individual_results.append({
-                'index': i,
-                'result': single_result
-            })
+    seq_inputs = st.session_state.sequences
+    # 多个序列并行处理，PDB序列下载等网络请求可以同时进行
+    # 工作线程需要绑定当前脚本上下文才能使用st.cache_data；错误信息带回主线程再输出
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=min(8, len(seq_inputs)), initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        resolved = list(executor.map(_resolve_and_analyze, seq_inputs))
+    for _, error_message in resolved:
+        if error_message:
+            st.error(error_message)
+    
+    # 记录(序列编号, 有效序列)
+    analyzed_sequences = [(i, sequence) for i, (sequence, _) in enumerate(resolved) if sequence]
             
-    if not valid_sequences_found:
+    if not analyzed_sequences:
         st.warning("请先输入有效的氨基酸序列")
     else:
-        # 使用合并后的序列进行分析
-        st.session_state.current_analysis_index = -1  # 设置为-1表示全局合并分析
-        st.session_state.analysis_info = "合并所有序列的理化性质分析结果"
-        # 调用分析函数
-        result = analyze_sequence(merged_sequence)
-        st.session_state.last_analysis_result = result
-        # 保存单独分析结果
-        st.session_state.individual_analysis_results = individual_results
+        # 只保存序列本身，分析结果由analyze_sequence的缓存提供
+        st.session_state.analyzed_sequences = analyzed_sequences
 
 # 显示合并分析结果
-if st.session_state.last_analysis_result is not None and st.session_state.get('current_analysis_index') == -1:
-    # 显示合并结果
-    with st.expander(f"📊 {st.session_state.analysis_info}", expanded=True):
-        display_physicochemical_properties(st.session_state.last_analysis_result)
+if st.session_state.analyzed_sequences:
+    analyzed_sequences = st.session_state.analyzed_sequences
+    individual_results = [(idx, analyze_sequence(sequence)) for idx, sequence in analyzed_sequences]
+    
+    # 合并结果直接由各序列的计数向量相加得到，不再重新分析拼接后的序列
+    total_counts = sum(result['counts'] for _, result in individual_results)
+    merged_result = _metrics_from_counts(total_counts, analyzed_sequences[0][1][0], analyzed_sequences[-1][1][-1])
+    with st.expander("📊 合并所有序列的理化性质分析结果", expanded=True):
+        display_physicochemical_properties(merged_result)
         
-    # 显示单独结果（如果存在）
-    if 'individual_analysis_results' in st.session_state and st.session_state.individual_analysis_results:
-        st.markdown("### 🧬 各序列单独理化性质")
-        for item in st.session_state.individual_analysis_results:
-            idx = item['index']
-            res = item['result']
-            # 使用 expander 默认折叠，实现用户要求的“点击可以显示”
-            with st.expander(f"序列 {idx+1} 详情", expanded=False):
-                display_physicochemical_properties(res)
+    # 显示单独结果
+    st.markdown("### 🧬 各序列单独理化性质")
+    for idx, result in individual_results:
+        # 勾选后才渲染详情，未展开的序列不再生成整套指标HTML
+        if st.checkbox(f"序列 {idx+1} 详情", key=f"show_result_{idx}"):
+            display_physicochemical_properties(result)
 
 # 不再使用全局分析按钮，已移至每个序列的独立按钮
 
@@ -741,31 +795,50 @@ if st.session_state.last_analysis_result is not None and st.session_state.get('c
 # if analyze_btn:
 #    相关代码已移至每个序列的独立按钮中
 
-def is_valid_pdb_id(pdb_id):
-    """验证PDB ID格式"""
-    return len(pdb_id) == 4 and re.match(r'^[0-9a-zA-Z]{4}$', pdb_id)
+# 模拟PDB结构的头部模板，只需填入时间戳
+_MOCK_PDB_HEADER = """HEADER    SIMULATED PROTEIN STRUCTURE    %s
+TITLE     MOCK PREDICTION RESULT
+COMPND    MOCK PROTEIN
+SOURCE    SIMULATED BY TRAE AI
+KEYWDS    MOCK, STRUCTURE, PREDICTION
+EXPDTA    MOCK DATA
+AUTHOR    TRAE AI
+REMARK    1 AUTH GENERATED BY MOCK PROTEIN STRUCTURE PREDICTION
+"""
 
-def get_sequence_from_pdb(pdb_id):
-    """从PDB获取序列"""
-    if not is_valid_pdb_id(pdb_id):
-        st.error(f"{pdb_id} 不是有效的PDB ID")
-        return None
+# 模拟结构中每个残基一行的CA原子记录
+_MOCK_ATOM_LINE = "ATOM  %5d  CA  %3s A%4d    %8.3f%8.3f%8.3f  1.00 99.99           C\n"
+
+# 单字母到三字母残基名
+_THREE_LETTER = dict(zip(_AA_LETTERS, (
+    'ALA', 'CYS', 'ASP', 'GLU', 'PHE', 'GLY', 'HIS', 'ILE', 'LYS', 'LEU',
+    'MET', 'ASN', 'PRO', 'GLN', 'ARG', 'SER', 'THR', 'VAL', 'TRP', 'TYR'
+)))
+
+# 相邻CA原子间距 (Å)
+_CA_CA_DISTANCE = 3.8
+
+def _build_mock_pdb(sequence, timestamp):
+    """按序列生成模拟的CA骨架PDB，同一序列总是得到相同的坐标"""
+    n = len(sequence)
+    rng = np.random.default_rng(zlib.crc32(sequence.encode('ascii')))
     
-    fasta_url = f"https://www.rcsb.org/fasta/entry/{pdb_id.upper()}/download"
+    # 随机方向、固定步长的随机游走作为CA坐标
+    steps = rng.standard_normal((n, 3))
+    steps *= _CA_CA_DISTANCE / np.linalg.norm(steps, axis=1, keepdims=True)
+    coords = np.cumsum(steps, axis=0)
     
-    try:
-        response = requests.get(fasta_url, timeout=10)
-        response.raise_for_status()
-        
-        lines = [line.strip() for line in response.text.split('\n') if line.strip()]
-        sequence_lines = [line for line in lines[1:] if "|" not in line]  
-        raw_sequence = ''.join(sequence_lines).replace(' ', '').replace('\n', '')
-        
-        return clean_sequence(raw_sequence)
-        
-    except requests.exceptions.RequestException as e:
-        st.error(f"PDB序列下载失败: {e}")
-        return None
+    fields = np.empty((n, 6), dtype=object)
+    fields[:, 0] = fields[:, 2] = np.arange(1, n + 1)
+    fields[:, 1] = [_THREE_LETTER.get(aa, 'UNK') for aa in sequence]
+    fields[:, 3:] = coords
+    
+    # 头部、所有原子记录和结尾在一次格式化中生成，不再拼接中间字符串
+    template = ''.join((_MOCK_PDB_HEADER, _MOCK_ATOM_LINE * n, "ENDMDL\n"))
+    return template % (timestamp, *fields.ravel().tolist())
+
+# 模拟数据使用的随机数生成器
+_MOCK_RNG = random.Random()
 
 def mock_protein_structure_prediction(sequence):
     """
@@ -778,46 +851,21 @@ def mock_protein_structure_prediction(sequence):
     Returns:
         dict: 包含模拟预测结果的字典
     """
-    # 模拟预测延迟
-    time.sleep(2)
-    
     # 模拟预测结果
-    import random
-    confidence = round(random.uniform(70, 99), 1)
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    uniform = _MOCK_RNG.uniform
+    confidence = round(uniform(70, 99), 1)
+    # 同一次预测的时间戳和结构ID使用同一时刻
+    now = time.localtime()
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", now)
     
     # 生成模拟的PDB格式结构数据
-    mock_pdb_data = """HEADER    SIMULATED PROTEIN STRUCTURE    {timestamp}
-TITLE     MOCK PREDICTION RESULT
-COMPND    MOCK PROTEIN
-SOURCE    SIMULATED BY TRAE AI
-KEYWDS    MOCK, STRUCTURE, PREDICTION
-EXPDTA    MOCK DATA
-AUTHOR    TRAE AI
-REMARK    1 AUTH GENERATED BY MOCK PROTEIN STRUCTURE PREDICTION
-ATOM      1  N   GLY A   1      12.431  -1.025   0.762  1.00 99.99           N
-ATOM      2  CA  GLY A   1      11.766   0.098   0.228  1.00 99.99           C
-ATOM      3  C   GLY A   1      12.374   1.319   0.663  1.00 99.99           C
-ATOM      4  O   GLY A   1      13.552   1.417   0.385  1.00 99.99           O
-ATOM      5  N   ALA A   2      11.562   2.285   1.334  1.00 99.99           N
-ATOM      6  CA  ALA A   2      12.043   3.560   1.869  1.00 99.99           C
-ATOM      7  C   ALA A   2      11.111   4.638   1.661  1.00 99.99           C
-ATOM      8  O   ALA A   2      10.852   5.738   2.238  1.00 99.99           O
-ATOM      9  CB  ALA A   2      13.563   3.810   1.526  1.00 99.99           C
-ATOM     10  N   SER A   3      10.541   4.408   0.474  1.00 99.99           N
-ATOM     11  CA  SER A   3       9.658   5.368   0.145  1.00 99.99           C
-ATOM     12  C   SER A   3       8.264   4.957  -0.115  1.00 99.99           C
-ATOM     13  O   SER A   3       7.228   5.592  -0.293  1.00 99.99           O
-ATOM     14  CB  SER A   3      10.023   6.731  -0.365  1.00 99.99           C
-ATOM     15  OG  SER A   3      11.284   7.120  -0.705  1.00 99.99           O
-ENDMDL
-""".format(timestamp=timestamp)
+    mock_pdb_data = _build_mock_pdb(sequence, timestamp)
     
     # 生成模拟的结构质量指标
     mock_metrics = {
-        "plddt": round(random.uniform(70, 95), 1),
-        "tm_score": round(random.uniform(0.7, 0.95), 3),
-        "rmsd": round(random.uniform(0.5, 3.0), 2)
+        "plddt": round(uniform(70, 95), 1),
+        "tm_score": round(uniform(0.7, 0.95), 3),
+        "rmsd": round(uniform(0.5, 3.0), 2)
     }
     
     return {
@@ -826,7 +874,7 @@ ENDMDL
         "metrics": mock_metrics,
         "structure_data": {
             "content": mock_pdb_data,
-            "structure_id": f"mock_{time.strftime('%Y%m%d_%H%M%S')}"
+            "structure_id": f"mock_{time.strftime('%Y%m%d_%H%M%S', now)}"
         },
         "message": "这是一个模拟的蛋白质结构预测结果，用于演示功能",
         "simulation": True
@@ -844,15 +892,11 @@ def mock_calculate_affinity(sequence1, sequence2):
     Returns:
         dict: 包含模拟亲和度结果的字典
     """
-    # 模拟API延迟
-    time.sleep(1.5)
-    
-    import random
-    
     # 生成模拟亲和度数据
-    affinity_score = round(random.uniform(0.5, 1.0), 4)
-    binding_energy = round(random.uniform(-15, -1), 2)
-    dissociation_constant = round(random.uniform(1e-12, 1e-6), 12)
+    uniform = _MOCK_RNG.uniform
+    affinity_score = round(uniform(0.5, 1.0), 4)
+    binding_energy = round(uniform(-15, -1), 2)
+    dissociation_constant = round(uniform(1e-12, 1e-6), 12)
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     
     # 生成结合强度描述
@@ -878,7 +922,60 @@ def mock_calculate_affinity(sequence1, sequence2):
         "method": "mock_binding_prediction"
     }
 
-def api_protein_structure_prediction(sequence, api_key, api_url):
+def _json_dumps(obj):
+    """序列化为JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+def _json_loads(data):
+    """解析JSON字节串"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _ignore_debug(fmt, *args):
+    """未开启调试时使用，直接丢弃调试信息"""
+
+def _debug_logger(records):
+    """返回把 (格式串, 参数) 追加到records的记录函数；records为None时返回_ignore_debug"""
+    if records is None:
+        return _ignore_debug
+    return lambda fmt, *args: records.append((fmt, args))
+
+def _read_prediction_json(response):
+    """读取预测响应JSON；安装了ijson时流式解析，structures只完整构建第一个结构"""
+    try:
+        import ijson
+    except ImportError:  # 未安装ijson时整体解析
+        return _json_loads(response.content)
+    
+    response.raw.decode_content = True
+    result = {}
+    key = builder = None
+    structure_count = 0
+    for prefix, event, value in ijson.parse(response.raw, use_float=True):
+        # 顶层的每个键单独构建
+        if prefix == '':
+            if event == 'map_key':
+                if builder is not None:
+                    result[key] = builder.value
+                key, builder = value, ijson.ObjectBuilder()
+            elif event == 'end_map' and builder is not None:
+                result[key] = builder.value
+            continue
+        
+        # 只用到第一个结构，其余结构以None占位，保留结构数量
+        if prefix == 'structures.item' and event not in ('map_key', 'end_map', 'end_array'):
+            structure_count += 1
+            if structure_count > 1:
+                builder.event('null', None)
+        if structure_count > 1 and prefix.startswith('structures.item'):
+            continue
+        builder.event(event, value)
+    return result
+
+def api_protein_structure_prediction(sequence, api_key, api_url, debug_records=None):
     """
     使用API进行蛋白质结构预测
     
@@ -886,6 +983,7 @@ def api_protein_structure_prediction(sequence, api_key, api_url):
         sequence: 氨基酸序列
         api_key: API密钥
         api_url: API端点URL
+        debug_records: 调试记录列表；传入时以 (格式串, 参数) 追加调试记录，由调用方合并显示
     
     Returns:
         dict: 包含预测结果的字典
@@ -893,12 +991,15 @@ def api_protein_structure_prediction(sequence, api_key, api_url):
     Raises:
         Exception: 当API请求失败时
     """
-    # 初始化调试信息列表
-    debug_info = []
-    debug_info.append("🔍 开始预测调试信息:")
-    debug_info.append(f"- 序列长度: {len(sequence)}")
-    debug_info.append(f"- API URL: {api_url}")
-    debug_info.append(f"- API Key格式检查: {'有效' if api_key.startswith('nvapi-') else '无效'}")
+    import requests
+
+    # 调试记录以 (格式串, 参数) 的形式追加到调用方的列表，显示时才格式化；未传入列表时直接丢弃
+    debug_enabled = debug_records is not None
+    log = _debug_logger(debug_records)
+    log("🔍 开始预测调试信息:")
+    log("- 序列长度: %s", len(sequence))
+    log("- API URL: %s", api_url)
+    log("- API Key格式检查: %s", '有效' if api_key.startswith('nvapi-') else '无效')
     
     # 构建请求头 - 根据示例代码添加必要的轮询参数
     NVCF_POLL_SECONDS = 300
@@ -925,71 +1026,73 @@ def api_protein_structure_prediction(sequence, api_key, api_url):
     }
     try:
         # 发送预测请求 - 增加超时时间并添加更详细的调试信息
-        debug_info.append(f"- 正在连接到API: {api_url}")
-        debug_info.append("- 正在发送请求数据，请稍候...")
-        debug_info.append("- 注意：NVIDIA API可能需要较长响应时间(1-5分钟)")
+        log("- 正在连接到API: %s", api_url)
+        log("- 正在发送请求数据，请稍候...")
+        log("- 注意：NVIDIA API可能需要较长响应时间(1-5分钟)")
         
         # 增加超时时间到300秒以匹配NVCF-POLL-SECONDS设置，应对API可能的长时间响应
-        response = requests.post(api_url, json=payload, headers=headers, timeout=300)
+        response = _get_http_session().post(api_url, data=_json_dumps(payload), headers=headers, timeout=300, stream=True)
         
         # 添加更多调试信息
-        debug_info.append(f"- HTTP状态码: {response.status_code}")
-        debug_info.append(f"- 响应头: {dict(response.headers)}")
-        
-        # 保存调试信息到session_state
-        if 'debug_info' not in st.session_state:
-            st.session_state.debug_info = []
-        st.session_state.debug_info = debug_info
+        log("- HTTP状态码: %s", response.status_code)
+        if debug_enabled:
+            log("- 响应头: %s", dict(response.headers))
         
         # 处理202 Accepted响应 - 根据示例代码实现轮询逻辑
         if response.status_code == 202:
-            debug_info.append("- 收到202 Accepted响应，开始轮询任务状态")
+            log("- 收到202 Accepted响应，开始轮询任务状态")
             task_id = response.headers.get("nvcf-reqid")
+            # 202响应体不再使用，立即释放连接回连接池供轮询复用
+            response.close()
             
             if not task_id:
                 raise Exception("未从202响应中获取到task_id")
                 
-            debug_info.append(f"- 获取到task_id: {task_id}")
+            log("- 获取到task_id: %s", task_id)
             status_url = f"https://api.nvcf.nvidia.com/v2/nvcf/pexec/status/{task_id}"
-            debug_info.append(f"- 状态查询URL: {status_url}")
+            log("- 状态查询URL: %s", status_url)
             
-            # 轮询状态
-            max_retries = 30
+            # 轮询状态：间隔从2秒开始指数增长，最长20秒，总时长不超过轮询预算
+            poll_budget = 600
+            deadline = time.monotonic() + poll_budget
             retry_count = 0
-            while retry_count < max_retries:
+            while time.monotonic() < deadline:
                 retry_count += 1
-                debug_info.append(f"- 轮询尝试 {retry_count}/{max_retries}")
+                log("- 轮询尝试 %s", retry_count)
                 
-                status_response = requests.get(status_url, headers=headers, timeout=120)
-                debug_info.append(f"  - 状态响应码: {status_response.status_code}")
+                status_response = _get_http_session().get(status_url, headers=headers, timeout=120, stream=True)
+                log("  - 状态响应码: %s", status_response.status_code)
                 
                 if status_response.status_code == 200:
-                    debug_info.append("  - 任务完成，获取到结果")
-                    # 更新调试信息
-                    st.session_state.debug_info = debug_info
+                    log("  - 任务完成，获取到结果")
                     # 使用状态响应继续处理
                     response = status_response
                     break
                 elif status_response.status_code in [400, 401, 404, 422, 500]:
                     error_msg = f"轮询任务状态失败 (状态码: {status_response.status_code})\n{status_response.text}"
-                    debug_info.append(f"  - 轮询失败: {error_msg}")
-                    st.session_state.debug_info = debug_info
+                    log("  - 轮询失败: %s", error_msg)
                     raise Exception(error_msg)
                 
-                # 等待后重试
-                wait_time = 20
-                debug_info.append(f"  - 任务尚未完成，{wait_time}秒后重试")
+                # 等待后重试，服务器给出Retry-After时以其为准
+                wait_time = min(20.0, 2.0 * 1.5 ** (retry_count - 1))
+                retry_after = status_response.headers.get("Retry-After")
+                # 未完成的状态响应不再使用，释放连接供下一次轮询复用
+                status_response.close()
+                if retry_after and retry_after.isdigit():
+                    wait_time = float(retry_after)
+                wait_time = min(wait_time, max(0.0, deadline - time.monotonic()))
+                log("  - 任务尚未完成，%.1f秒后重试", wait_time)
                 time.sleep(wait_time)
-            
-            if retry_count >= max_retries:
-                raise Exception(f"轮询超时，已尝试 {max_retries} 次")
+            else:
+                raise Exception(f"轮询超时，已尝试 {retry_count} 次（{poll_budget}秒）")
         
         # 检查HTTP响应状态
         if response.status_code != 200:
             error_msg = f"API请求失败 (状态码: {response.status_code})\n"
             try:
-                error_data = response.json()
-                debug_info.append(f"- 错误响应JSON: {error_data}")
+                error_data = _json_loads(response.content)
+                if debug_enabled:
+                    log("- 错误响应JSON: %s", error_data)
                 if "error" in error_data:
                     error_msg += f"错误详情: {error_data['error']}"
                 elif "message" in error_data:
@@ -997,212 +1100,307 @@ def api_protein_structure_prediction(sequence, api_key, api_url):
                 else:
                     error_msg += f"响应内容: {response.text[:500]}..."
             except Exception as json_error:
-                debug_info.append(f"- JSON解析错误: {str(json_error)}")
+                log("- JSON解析错误: %s", json_error)
                 error_msg += f"响应内容: {response.text[:500]}..."
             
-            # 更新调试信息
-            st.session_state.debug_info = debug_info
             raise Exception(error_msg)
         
         # 解析响应
-        result = response.json()
-        debug_info.append("- 响应JSON格式正确")
-        debug_info.append(f"- 响应内容概览: {list(result.keys())}")
+        result = _read_prediction_json(response)
+        log("- 响应JSON格式正确")
+        if debug_enabled:
+            log("- 响应内容概览: %s", list(result.keys()))
         
         # 添加更详细的响应结构调试信息
-        debug_info.append("- 响应详细结构:")
-        for key, value in result.items():
-            if isinstance(value, dict):
-                debug_info.append(f"  * {key}: {list(value.keys())}")
-            elif isinstance(value, list):
-                debug_info.append(f"  * {key}: 列表，长度={len(value)}")
-                # 如果是structures列表，显示第一个元素的信息
-                if key == 'structures' and value:
-                    first_item = value[0]
-                    if isinstance(first_item, dict):
-                        debug_info.append(f"    - 第一个结构: {list(first_item.keys())}")
-            else:
-                debug_info.append(f"  * {key}: {type(value).__name__}")
-        
-        # 更新调试信息
-        st.session_state.debug_info = debug_info
+        if debug_enabled:
+            # 只展开结果提取会用到的字段，其余字段已在概览中列出
+            log("- 响应详细结构:")
+            for key in ('structures', 'confidence_scores', 'metrics', 'prediction'):
+                if key not in result:
+                    continue
+                value = result[key]
+                if isinstance(value, dict):
+                    log("  * %s: %s", key, list(value.keys()))
+                elif isinstance(value, list):
+                    log("  * %s: 列表，长度=%s", key, len(value))
+                    # 如果是structures列表，显示第一个元素的信息
+                    if key == 'structures' and value:
+                        first_item = value[0]
+                        if isinstance(first_item, dict):
+                            log("    - 第一个结构: %s", list(first_item.keys()))
+                else:
+                    log("  * %s: %s", key, type(value).__name__)
         
         # 标准化结果格式 - 根据示例代码中的响应结构
         structure_content = ""
         structure_format = "mmcif"  # 默认格式
         confidence_value = "未知"
         
+        # 顶层字段只查找一次
+        structures = result.get('structures')
+        confidence_scores = result.get('confidence_scores')
+        root_metrics = result.get('metrics')
+        
         # 1. 从structures列表中提取结构数据（根据示例代码）
-        if 'structures' in result and isinstance(result['structures'], list) and len(result['structures']) > 0:
-            debug_info.append(f"- 发现structures列表，包含 {len(result['structures'])} 个结构")
+        if isinstance(structures, list) and structures:
+            log("- 发现structures列表，包含 %s 个结构", len(structures))
             # 获取第一个结构
-            first_structure = result['structures'][0]
+            first_structure = structures[0]
             
             if isinstance(first_structure, dict):
                 # 根据示例代码，结构数据存储在'structure'字段中
-                if 'structure' in first_structure:
-                    structure_content = first_structure['structure']
-                    debug_info.append("- 从'structure'字段提取结构数据")
+                if (content := first_structure.get('structure')) is not None:
+                    structure_content = content
+                    log("- 从'structure'字段提取结构数据")
                     
                     # 确定格式
-                    if 'format' in first_structure:
-                        structure_format = first_structure['format']
-                        debug_info.append(f"- 格式从'format'字段确定: {structure_format}")
+                    if fmt := first_structure.get('format'):
+                        structure_format = fmt
+                        log("- 格式从'format'字段确定: %s", structure_format)
                     else:
                         # 尝试根据内容判断
                         if structure_content.strip().startswith('HEADER'):
                             structure_format = "pdb"
                         else:
                             structure_format = "mmcif"
-                        debug_info.append(f"- 自动判断格式: {structure_format}")
+                        log("- 自动判断格式: %s", structure_format)
                 else:
-                    debug_info.append(f"- 结构字典中没有'structure'字段，键列表: {list(first_structure.keys())}")
+                    log("- 结构字典中没有'structure'字段，键列表: %s", list(first_structure.keys()))
                     # 尝试其他可能的字段
-                    for key in ['content', 'pdb', 'mmcif']:
-                        if key in first_structure:
-                            structure_content = first_structure[key]
-                            structure_format = key if key in ['pdb', 'mmcif'] else 'unknown'
-                            debug_info.append(f"- 从'{key}'字段提取结构数据")
+                    for key in ('content', 'pdb', 'mmcif'):
+                        if (content := first_structure.get(key)) is not None:
+                            structure_content = content
+                            structure_format = key if key != 'content' else 'unknown'
+                            log("- 从'%s'字段提取结构数据", key)
                             break
             else:
-                debug_info.append(f"- 结构项不是字典，类型: {type(first_structure).__name__}")
+                log("- 结构项不是字典，类型: %s", type(first_structure).__name__)
         else:
-            debug_info.append("- 未发现有效的structures列表")
-            # 尝试其他可能的位置
-            for path in ['prediction.structure', 'prediction', '']:
-                current = result
-                if path:
-                    parts = path.split('.')
-                    for part in parts:
-                        if isinstance(current, dict) and part in current:
-                            current = current[part]
-                        else:
-                            current = None
+            log("- 未发现有效的structures列表")
+            # 尝试其他可能的位置，按 prediction.structure、prediction、根级的顺序取第一个找到的结构
+            prediction = result.get('prediction')
+            prediction_structure = prediction.get('structure') if isinstance(prediction, dict) else None
+            for path, current in (('prediction.structure', prediction_structure), ('prediction', prediction), ('', result)):
+                if isinstance(current, dict):
+                    for key in ('structure', 'content', 'pdb', 'mmcif'):
+                        if isinstance(content := current.get(key), str):
+                            structure_content = content
+                            structure_format = key if key in ('pdb', 'mmcif') else 'unknown'
+                            log("- 从%s.%s提取结构数据", path, key)
                             break
-                
-                if current:
-                    if isinstance(current, dict):
-                        for key in ['structure', 'content', 'pdb', 'mmcif']:
-                            if key in current:
-                                structure_content = current[key]
-                                structure_format = key if key in ['pdb', 'mmcif'] else 'unknown'
-                                debug_info.append(f"- 从{path}.{key}提取结构数据")
-                                break
-                    elif isinstance(current, str):
-                        structure_content = current
-                        debug_info.append(f"- 从{path}提取结构字符串")
+                elif isinstance(current, str):
+                    structure_content = current
+                    log("- 从%s提取结构字符串", path)
+                if structure_content:
+                    break
         
         # 2. 提取置信度信息（根据示例代码）
-        if 'confidence_scores' in result and isinstance(result['confidence_scores'], list) and len(result['confidence_scores']) > 0:
-            confidence_value = f"{result['confidence_scores'][0]:.2f}"
-            debug_info.append(f"- 从confidence_scores提取置信度: {confidence_value}")
+        if isinstance(confidence_scores, list) and confidence_scores:
+            confidence_value = f"{confidence_scores[0]:.2f}"
+            log("- 从confidence_scores提取置信度: %s", confidence_value)
         else:
-            debug_info.append("- 未找到confidence_scores字段")
+            log("- 未找到confidence_scores字段")
             # 尝试其他可能的置信度字段
-            for score_key in ['iptm_scores', 'ptm_scores', 'confidence']:
-                if score_key in result:
-                    if isinstance(result[score_key], list) and result[score_key]:
-                        confidence_value = f"{result[score_key][0]:.2f}"
-                        debug_info.append(f"- 从{score_key}提取置信度: {confidence_value}")
-                    elif isinstance(result[score_key], (int, float)):
-                        confidence_value = f"{result[score_key]:.2f}"
-                        debug_info.append(f"- 从{score_key}提取置信度: {confidence_value}")
+            for score_key in ('iptm_scores', 'ptm_scores', 'confidence'):
+                if (score := result.get(score_key)) is not None:
+                    if isinstance(score, list) and score:
+                        confidence_value = f"{score[0]:.2f}"
+                        log("- 从%s提取置信度: %s", score_key, confidence_value)
+                    elif isinstance(score, (int, float)):
+                        confidence_value = f"{score:.2f}"
+                        log("- 从%s提取置信度: %s", score_key, confidence_value)
                     break
         
         # 添加格式信息到调试日志
-        debug_info.append(f"- 最终检测到的结构格式: {structure_format}")
-        debug_info.append(f"- 结构数据长度: {len(structure_content) if structure_content else 0} 字符")
+        log("- 最终检测到的结构格式: %s", structure_format)
+        log("- 结构数据长度: %s 字符", len(structure_content) if structure_content else 0)
         
         # 提取metrics信息
-        metrics = {}
         # 尝试从不同位置提取metrics
-        if 'metrics' in result:
-            metrics = result['metrics']
-            debug_info.append("- 从根级提取metrics")
-        elif 'prediction' in result and isinstance(result['prediction'], dict) and 'metrics' in result['prediction']:
-            metrics = result['prediction']['metrics']
-            debug_info.append("- 从prediction提取metrics")
+        if root_metrics is not None:
+            metrics = root_metrics
+            log("- 从根级提取metrics")
+        elif isinstance(prediction := result.get('prediction'), dict) and (metrics := prediction.get('metrics')) is not None:
+            log("- 从prediction提取metrics")
+        else:
+            metrics = {}
         
         # 添加metrics信息到调试日志
         if metrics:
-            debug_info.append(f"- 提取到metrics: {list(metrics.keys())}")
+            if debug_enabled:
+                log("- 提取到metrics: %s", list(metrics.keys()))
         else:
-            debug_info.append("- 未提取到metrics")
+            log("- 未提取到metrics")
         
         # 标准化结果，使用新提取的置信度值和结构数据
-        # 保存更多原始响应数据用于调试
-        raw_response_data = {
-            "has_structures": 'structures' in result and isinstance(result['structures'], list),
-            "response_keys": list(result.keys()),
-            "has_confidence_scores": 'confidence_scores' in result and isinstance(result['confidence_scores'], list),
-            "has_metrics": 'metrics' in result and isinstance(result['metrics'], dict)
-        }
+        # 开启调试时保存更多原始响应数据
+        if debug_enabled:
+            raw_response_data = {
+                "has_structures": isinstance(structures, list),
+                "response_keys": list(result),
+                "has_confidence_scores": isinstance(confidence_scores, list),
+                "has_metrics": isinstance(root_metrics, dict)
+            }
         
-        # 添加structures列表的前几个元素（如果存在）
-        if 'structures' in result and isinstance(result['structures'], list):
-            raw_response_data['structures_count'] = len(result['structures'])
-            # 保存第一个结构的关键信息
-            if result['structures'] and isinstance(result['structures'][0], dict):
-                first_struct = result['structures'][0]
-                raw_response_data['first_structure_keys'] = list(first_struct.keys())
-                # 保存格式信息
-                if 'format' in first_struct:
-                    raw_response_data['first_structure_format'] = first_struct['format']
+            # 添加structures列表的前几个元素（如果存在）
+            if isinstance(structures, list):
+                raw_response_data['structures_count'] = len(structures)
+                # 保存第一个结构的关键信息
+                if structures and isinstance(first_struct := structures[0], dict):
+                    raw_response_data['first_structure_keys'] = list(first_struct)
+                    # 保存格式信息
+                    if 'format' in first_struct:
+                        raw_response_data['first_structure_format'] = first_struct['format']
         
-        # 添加置信度信息
-        if 'confidence_scores' in result:
-            raw_response_data['confidence_scores_type'] = type(result['confidence_scores']).__name__
-            if isinstance(result['confidence_scores'], list):
-                raw_response_data['confidence_scores_count'] = len(result['confidence_scores'])
+            # 添加置信度信息
+            if confidence_scores is not None:
+                raw_response_data['confidence_scores_type'] = type(confidence_scores).__name__
+                if isinstance(confidence_scores, list):
+                    raw_response_data['confidence_scores_count'] = len(confidence_scores)
         
-        # 添加metrics信息
-        if 'metrics' in result:
-            raw_response_data['metrics_keys'] = list(result['metrics'].keys()) if isinstance(result['metrics'], dict) else None
+            # 添加metrics信息
+            if root_metrics is not None:
+                raw_response_data['metrics_keys'] = list(root_metrics) if isinstance(root_metrics, dict) else None
         
+        # 同一次预测的时间戳和结构ID使用同一时刻
+        now = time.localtime()
         standardized_result = {
             "confidence": confidence_value,
-            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", now),
             "structure_content": structure_content,
             "structure_format": structure_format,
             "metrics": metrics,
             "structure_data": {
                 "content": structure_content,
                 "format": structure_format,
-                "structure_id": f"nvidia_{time.strftime('%Y%m%d_%H%M%S')}"
+                "structure_id": f"nvidia_{time.strftime('%Y%m%d_%H%M%S', now)}"
             },
-            "simulation": False,
-            "raw_response": raw_response_data  # 保存更详细的原始响应信息
+            "simulation": False
         }
+        if debug_enabled:
+            standardized_result["raw_response"] = raw_response_data  # 保存更详细的原始响应信息
         
         # 添加标准化结果的调试信息
-        debug_info.append("- 标准化结果概览:")
-        debug_info.append(f"  * 置信度: {standardized_result['confidence']}")
-        debug_info.append(f"  * 指标数量: {len(standardized_result['metrics'])}")
-        debug_info.append(f"  * 结构格式: {standardized_result['structure_data']['format']}")
-        debug_info.append(f"  * 结构ID: {standardized_result['structure_data']['structure_id']}")
-        st.session_state.debug_info = debug_info
+        if debug_enabled:
+            log("- 标准化结果概览:")
+            log("  * 置信度: %s", standardized_result['confidence'])
+            log("  * 指标数量: %s", len(standardized_result['metrics']))
+            log("  * 结构格式: %s", standardized_result['structure_data']['format'])
+            log("  * 结构ID: %s", standardized_result['structure_data']['structure_id'])
         
         return standardized_result
         
     except requests.exceptions.Timeout:
-        debug_info.append("- 错误类型: 请求超时错误")
-        st.session_state.debug_info = debug_info
+        log("- 错误类型: 请求超时错误")
         raise Exception("API请求超时，请稍后再试")
     except requests.exceptions.ConnectionError:
-        debug_info.append("- 错误类型: 连接错误")
-        st.session_state.debug_info = debug_info
+        log("- 错误类型: 连接错误")
         raise Exception("无法连接到API服务器，请检查网络连接")
     except requests.exceptions.RequestException as e:
-        debug_info.append(f"- 错误类型: 请求异常")
-        debug_info.append(f"- 错误详情: {str(e)}")
-        st.session_state.debug_info = debug_info
+        log("- 错误类型: 请求异常")
+        log("- 错误详情: %s", e)
         raise Exception(f"API请求错误: {str(e)}")
     except Exception as e:
-        debug_info.append(f"- 错误类型: 其他异常")
-        debug_info.append(f"- 错误详情: {str(e)}")
-        st.session_state.debug_info = debug_info
+        log("- 错误类型: 其他异常")
+        log("- 错误详情: %s", e)
         raise Exception(f"预测过程中出错: {str(e)}")
 
+def _run_prediction(seq_idx, sequence_to_predict, original_sequence, api_settings, debug_enabled):
+    """执行单个预测任务（可在工作线程中运行，不读取session_state），返回 (状态, 结果, 调试信息)"""
+    debug_info = []
+    # 调试信息以 (格式串, 参数) 记录，未开启调试时不做任何格式化
+    log = _debug_logger(debug_info if debug_enabled else None)
+    # 每个任务只格式化一次时间戳
+    ts = time.strftime('%H:%M:%S') if debug_enabled else None
+    try:
+        # 预测处理
+        if api_settings['use_api'] and api_settings['api_key']:
+            # 使用实际API进行预测
+            log("[%s] 任务 %d - 调用实际API进行预测", ts, seq_idx + 1)
+            # API的调试记录直接写入本任务的调试信息，由主线程按任务顺序合并
+            result = api_protein_structure_prediction(
+                sequence_to_predict,
+                api_settings['api_key'],
+                api_settings['api_url'],
+                debug_info if debug_enabled else None
+            )
+        else:
+            # 使用模拟函数进行预测
+            log("[%s] 任务 %d - 使用模拟数据进行预测", ts, seq_idx + 1)
+            # 添加详细的调用信息
+            log("[%s] 任务 %d - 调用mock_protein_structure_prediction", ts, seq_idx + 1)
+            log("[%s] 任务 %d - 输入序列长度: %s", ts, seq_idx + 1, len(sequence_to_predict))
+            result = mock_protein_structure_prediction(sequence_to_predict)
+
+        # 详细检查预测结果
+        log("[%s] 任务 %d - 预测完成，结果类型: %s", ts, seq_idx + 1, type(result))
+
+        if not isinstance(result, dict):
+            raise TypeError(f"预测结果应该是字典类型，但实际是 {type(result).__name__}")
+
+        # 检查结果中的必要键
+        log("[%s] 任务 %d - 结果包含的键: %s", ts, seq_idx + 1, list(result.keys()))
+
+        # 检查是否有structure_data键
+        if 'structure_data' not in result:
+            log("[%s] 任务 %d - 警告: 结果中缺少'structure_data'键", ts, seq_idx + 1)
+            # 尝试查找可能的替代键
+            structure_keys = [k for k in result.keys() if 'structure' in k.lower() or 'pdb' in k.lower()]
+            log("[%s] 任务 %d - 可能的结构数据键: %s", ts, seq_idx + 1, structure_keys)
+        else:
+            # 检查structure_data的结构
+            structure_data = result['structure_data']
+            log("[%s] 任务 %d - structure_data类型: %s", ts, seq_idx + 1, type(structure_data))
+
+            if isinstance(structure_data, dict):
+                log("[%s] 任务 %d - structure_data中的键: %s", ts, seq_idx + 1, list(structure_data.keys()))
+                # 检查是否有content或pdb键
+                if 'content' not in structure_data and 'pdb' not in structure_data:
+                    log("[%s] 任务 %d - 警告: structure_data中缺少'content'或'pdb'键", ts, seq_idx + 1)
+
+        # 入库时统一格式为小写，并计算一次结构内容的哈希作为合并下载的缓存键
+        structure_data = result.get('structure_data')
+        if isinstance(structure_data, dict):
+            if isinstance(structure_data.get('format'), str):
+                structure_data['format'] = structure_data['format'].lower()
+            if isinstance(structure_data.get('content'), str):
+                structure_data['content_sha1'] = hashlib.sha1(structure_data['content'].encode('utf-8')).hexdigest()
+
+        # 添加序列信息到结果
+        result['sequence'] = sequence_to_predict
+        result['sequence_index'] = seq_idx
+        result['original_sequence'] = original_sequence
+        result['prediction_timestamp'] = time.time()
+
+        log("[%s] 任务 %d - 预测成功", ts, seq_idx + 1)
+        return "success", result, debug_info
+    except Exception as prediction_error:
+        # 处理预测错误，收集异常信息
+        error_type = prediction_error.__class__.__name__
+        error_message = str(prediction_error)
+
+        # 记录详细的错误信息
+        log("[%s] 任务 %d - 预测错误", ts, seq_idx + 1)
+        log("[%s] 任务 %d - 错误类型: %s", ts, seq_idx + 1, error_type)
+        log("[%s] 任务 %d - 错误消息: %s", ts, seq_idx + 1, error_message)
+
+        # 返回错误信息，由主线程写入结果
+        error_result = {
+            'error': f'预测失败: {error_message}',
+            'error_type': error_type,
+            'sequence_index': seq_idx,
+            'sequence': sequence_to_predict,
+            'error_timestamp': time.time()
+        }
+        
+        # 完整的错误堆栈只在开启调试时格式化
+        if debug_enabled:
+            error_trace = traceback.format_exc()
+            log("[%s] 任务 %d - 错误堆栈: %s", ts, seq_idx + 1, error_trace)
+            error_result['error_trace'] = error_trace
+        return "error", error_result, debug_info
+
+
 # 处理正在进行的预测任务
 def process_pending_predictions():
     """处理所有正在进行的预测任务"""
@@ -1211,53 +1409,62 @@ def process_pending_predictions():
         st.warning("序列列表不存在")
         return False
     
+    # 没有待处理的任务时直接返回，不必扫描所有任务状态
+    pending_indices = st.session_state.get('pending_task_indices')
+    if not pending_indices:
+        return False
+    
     if 'prediction_status' in st.session_state:
-        # 初始化预测结果列表
+        # 初始化预测结果字典（按序列索引存储）
         if 'prediction_results' not in st.session_state:
-            st.session_state.prediction_results = []
+            st.session_state.prediction_results = {}
         
-        # 确保prediction_status和sequences长度一致
-        while len(st.session_state.prediction_status) < len(st.session_state.sequences):
-            st.session_state.prediction_status.append("idle")
+        # 状态列表一次性补齐到与序列列表相同长度，结果字典直接按索引写入
+        sequences = st.session_state.sequences
+        statuses = st.session_state.prediction_status
+        results = st.session_state.prediction_results
+        if len(statuses) < len(sequences):
+            statuses.extend(["idle"] * (len(sequences) - len(statuses)))
         
         # 标记是否需要重新运行
         need_rerun = False
         
-        # 添加调试信息
+        # 添加调试信息，未开启调试时不做任何格式化
         debug_info = []
-        debug_info.append(f"开始处理预测任务 - 总共 {len(st.session_state.prediction_status)} 个任务")
-        debug_info.append(f"序列列表长度: {len(st.session_state.sequences)}")
+        debug_enabled = st.session_state.get('debug_enabled', False)
+        log = _debug_logger(debug_info if debug_enabled else None)
+        log("开始处理预测任务 - 总共 %s 个任务", len(statuses))
+        log("序列列表长度: %s", len(sequences))
         
         # 初始化进度列表
-        progress = [0] * len(st.session_state.prediction_status)
+        progress = [0] * len(statuses)
+        # 通过校验、等待实际预测的任务
+        pending_tasks = []
         
-        # 遍历所有状态为running的任务
-        for seq_idx, status in enumerate(st.session_state.prediction_status):
-            debug_info.append(f"任务 {seq_idx+1} 状态: {status}")
-            if status == "running" and seq_idx < len(st.session_state.sequences):
+        # 只遍历已登记为待处理的任务
+        for seq_idx in sorted(pending_indices):
+            status = statuses[seq_idx] if seq_idx < len(statuses) else "idle"
+            log("任务 %d 状态: %s", seq_idx + 1, status)
+            if status == "running" and seq_idx < len(sequences):
                 try:
                     # 获取序列并进行预测
-                    original_sequence = st.session_state.sequences[seq_idx]
-                    debug_info.append(f"任务 {seq_idx+1} - 原始序列: {original_sequence}")
+                    original_sequence = sequences[seq_idx]
+                    log("任务 %d - 原始序列: %s", seq_idx + 1, original_sequence)
                     
                     sequence = extract_sequence_from_input(original_sequence)
-                    debug_info.append(f"任务 {seq_idx+1} - 提取后序列: {sequence}")
-                    debug_info.append(f"任务 {seq_idx+1} - 序列长度: {len(sequence) if sequence else 0}")
+                    log("任务 %d - 提取后序列: %s", seq_idx + 1, sequence)
+                    log("任务 %d - 序列长度: %s", seq_idx + 1, len(sequence) if sequence else 0)
                     
                     # 首先检查序列是否有效
                     if not sequence:
                         # 序列无效，取消预测
-                        st.session_state.prediction_status[seq_idx] = "error"
+                        statuses[seq_idx] = "error"
                         error_msg = f"序列 {seq_idx+1} 无效或为空"
                         st.error(error_msg)
-                        debug_info.append(f"任务 {seq_idx+1} - 序列无效，标记为错误")
-                        
-                        # 确保预测结果列表长度足够
-                        while len(st.session_state.prediction_results) <= seq_idx:
-                            st.session_state.prediction_results.append({})
+                        log("任务 %d - 序列无效，标记为错误", seq_idx + 1)
                         
                         # 保存错误信息到结果中
-                        st.session_state.prediction_results[seq_idx] = {
+                        results[seq_idx] = {
                             'error': '无效或空序列',
                             'error_type': 'invalid_sequence',
                             'sequence_index': seq_idx
@@ -1272,26 +1479,22 @@ def process_pending_predictions():
                     sequence_to_predict = sequence
                     
                     # 检查是否是PDB ID
-                    if re.match(r'^[0-9a-zA-Z]{4}$', sequence):
+                    if _PDB_ID_RE.match(sequence):
                         # 从PDB数据库获取实际序列
                         try:
                             pdb_sequence = get_sequence_from_pdb(sequence)
                             if pdb_sequence:
                                 sequence_to_predict = pdb_sequence
-                                debug_info.append(f"任务 {seq_idx+1} - 从PDB获取序列成功，长度: {len(pdb_sequence)}")
+                                log("任务 %d - 从PDB获取序列成功，长度: %s", seq_idx + 1, len(pdb_sequence))
                             else:
                                 # 获取序列失败
-                                st.session_state.prediction_status[seq_idx] = "error"
+                                statuses[seq_idx] = "error"
                                 error_msg = f"无法获取PDB ID {sequence} 的序列"
                                 st.error(error_msg)
-                                debug_info.append(f"任务 {seq_idx+1} - 获取PDB序列失败")
-                                
-                                # 确保预测结果列表长度足够
-                                while len(st.session_state.prediction_results) <= seq_idx:
-                                    st.session_state.prediction_results.append({})
+                                log("任务 %d - 获取PDB序列失败", seq_idx + 1)
                                 
                                 # 保存错误信息到结果中
-                                st.session_state.prediction_results[seq_idx] = {
+                                results[seq_idx] = {
                                     'error': f'无法获取PDB ID {sequence} 的序列',
                                     'error_type': 'pdb_sequence_error',
                                     'sequence_index': seq_idx
@@ -1300,17 +1503,13 @@ def process_pending_predictions():
                                 need_rerun = True
                                 continue  # 继续处理下一个任务
                         except Exception as pdb_error:
-                            st.session_state.prediction_status[seq_idx] = "error"
+                            statuses[seq_idx] = "error"
                             error_msg = f"获取PDB序列时出错: {str(pdb_error)}"
                             st.error(error_msg)
-                            debug_info.append(f"任务 {seq_idx+1} - PDB错误: {str(pdb_error)}")
-                            
-                            # 确保预测结果列表长度足够
-                            while len(st.session_state.prediction_results) <= seq_idx:
-                                st.session_state.prediction_results.append({})
+                            log("任务 %d - PDB错误: %s", seq_idx + 1, pdb_error)
                             
                             # 保存错误信息到结果中
-                            st.session_state.prediction_results[seq_idx] = {
+                            results[seq_idx] = {
                                 'error': f'获取PDB序列时出错: {str(pdb_error)}',
                                 'error_type': 'pdb_exception',
                                 'sequence_index': seq_idx
@@ -1321,17 +1520,13 @@ def process_pending_predictions():
                     
                     # 不是PDB ID，检查序列长度
                     if len(sequence_to_predict) < 10:
-                        st.session_state.prediction_status[seq_idx] = "error"
+                        statuses[seq_idx] = "error"
                         error_msg = f"序列 {seq_idx+1} 太短，至少需要10个氨基酸"
                         st.error(error_msg)
-                        debug_info.append(f"任务 {seq_idx+1} - 序列太短，跳过")
-                        
-                        # 确保预测结果列表长度足够
-                        while len(st.session_state.prediction_results) <= seq_idx:
-                            st.session_state.prediction_results.append({})
+                        log("任务 %d - 序列太短，跳过", seq_idx + 1)
                         
                         # 保存错误信息到结果中
-                        st.session_state.prediction_results[seq_idx] = {
+                        results[seq_idx] = {
                             'error': f'序列太短，至少需要10个氨基酸，当前长度为 {len(sequence_to_predict)}',
                             'error_type': 'sequence_too_short',
                             'sequence': sequence_to_predict,
@@ -1349,121 +1544,20 @@ def process_pending_predictions():
                             'api_url': 'https://health.api.nvidia.com/v1/biology/mit/boltz2/predict'
                         }
                     
-                    debug_info.append(f"任务 {seq_idx+1} - API使用状态: {st.session_state.api_settings['use_api']}")
+                    log("任务 %d - API使用状态: %s", seq_idx + 1, st.session_state.api_settings['use_api'])
                     
-                    # 执行预测
-                    try:
-                        # 预测处理
-                        if st.session_state.api_settings['use_api'] and st.session_state.api_settings['api_key']:
-                            # 使用实际API进行预测
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 调用实际API进行预测")
-                            result = api_protein_structure_prediction(
-                                sequence_to_predict,
-                                st.session_state.api_settings['api_key'],
-                                st.session_state.api_settings['api_url']
-                            )
-                        else:
-                            # 使用模拟函数进行预测
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 使用模拟数据进行预测")
-                            # 添加详细的调用信息
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 调用mock_protein_structure_prediction")
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 输入序列长度: {len(sequence_to_predict)}")
-                            result = mock_protein_structure_prediction(sequence_to_predict)
-                        
-                        # 详细检查预测结果
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 预测完成，结果类型: {type(result)}")
-                        
-                        if not isinstance(result, dict):
-                            raise TypeError(f"预测结果应该是字典类型，但实际是 {type(result).__name__}")
-                        
-                        # 检查结果中的必要键
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 结果包含的键: {list(result.keys())}")
-                        
-                        # 检查是否有structure_data键
-                        if 'structure_data' not in result:
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 警告: 结果中缺少'structure_data'键")
-                            # 尝试查找可能的替代键
-                            structure_keys = [k for k in result.keys() if 'structure' in k.lower() or 'pdb' in k.lower()]
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 可能的结构数据键: {structure_keys}")
-                        else:
-                            # 检查structure_data的结构
-                            structure_data = result['structure_data']
-                            debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - structure_data类型: {type(structure_data)}")
-                            
-                            if isinstance(structure_data, dict):
-                                debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - structure_data中的键: {list(structure_data.keys())}")
-                                # 检查是否有content或pdb键
-                                if 'content' not in structure_data and 'pdb' not in structure_data:
-                                    debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 警告: structure_data中缺少'content'或'pdb'键")
-                        
-                        # 添加序列信息到结果
-                        result['sequence'] = sequence_to_predict
-                        result['sequence_index'] = seq_idx
-                        result['original_sequence'] = original_sequence
-                        result['prediction_timestamp'] = time.time()
-                        
-                        # 确保预测结果列表长度足够
-                        while len(st.session_state.prediction_results) <= seq_idx:
-                            st.session_state.prediction_results.append({})
-                        
-                        # 保存预测结果
-                        st.session_state.prediction_results[seq_idx] = result
-                        st.session_state.prediction_status[seq_idx] = "success"
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 预测成功，结果已保存")
-                        need_rerun = True
-                        
-                        # 更新进度
-                        progress[seq_idx] = 100
-                    except Exception as prediction_error:
-                        # 处理预测错误，收集详细的异常信息
-                        import traceback
-                        error_type = type(prediction_error).__name__
-                        error_message = str(prediction_error)
-                        error_trace = traceback.format_exc()
-                        
-                        st.session_state.prediction_status[seq_idx] = "error"
-                        error_msg = f"预测失败: {error_message}"
-                        st.error(error_msg)
-                        
-                        # 记录详细的错误信息
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 预测错误")
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 错误类型: {error_type}")
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 错误消息: {error_message}")
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 错误堆栈: {error_trace[:500]}..." if len(error_trace) > 500 else f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 错误堆栈: {error_trace}")
-                        
-                        # 确保预测结果列表长度足够
-                        while len(st.session_state.prediction_results) <= seq_idx:
-                            st.session_state.prediction_results.append({})
-                        
-                        # 保存详细的错误信息到结果中
-                        st.session_state.prediction_results[seq_idx] = {
-                            'error': f'预测失败: {error_message}',
-                            'error_type': error_type,
-                            'error_trace': error_trace,
-                            'sequence_index': seq_idx,
-                            'sequence': sequence_to_predict,
-                            'error_timestamp': time.time()
-                        }
-                        
-                        need_rerun = True
-                        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 任务 {seq_idx+1} - 错误信息已保存到索引 {seq_idx}")
-                        
-                        # 更新进度
-                        progress[seq_idx] = 100
+                    # 加入待预测队列，稍后统一并发执行
+                    pending_tasks.append((seq_idx, sequence_to_predict, original_sequence))
                     
                 except Exception as task_error:
                     # 捕获任务级别的异常
-                    st.session_state.prediction_status[seq_idx] = "error"
+                    statuses[seq_idx] = "error"
                     error_msg = f"处理任务时出错: {str(task_error)}"
                     st.error(error_msg)
-                    debug_info.append(f"任务 {seq_idx+1} - 任务级错误: {str(task_error)}")
-                    
-                    # 确保预测结果列表长度足够
-                    while len(st.session_state.prediction_results) <= seq_idx:
-                        st.session_state.prediction_results.append({})
+                    log("任务 %d - 任务级错误: %s", seq_idx + 1, task_error)
                     
                     # 保存错误信息到结果中
-                    st.session_state.prediction_results[seq_idx] = {
+                    results[seq_idx] = {
                         'error': f'任务处理错误: {str(task_error)}',
                         'error_type': 'task_exception',
                         'sequence_index': seq_idx
@@ -1472,18 +1566,53 @@ def process_pending_predictions():
                     need_rerun = True
                     progress[seq_idx] = 100
         
-        # 保存调试信息（包含时间戳）
-        debug_info.append(f"[{time.strftime('%H:%M:%S')}] 处理完成，是否需要重新运行: {need_rerun}")
-        st.session_state.prediction_debug_info = debug_info
+        # 并发执行所有待预测任务，各任务的网络等待相互重叠
+        if pending_tasks:
+            api_settings = st.session_state.api_settings
+            ctx = get_script_run_ctx()
+            # 相同的序列只请求一次，结果分发给所有重复的任务
+            unique_tasks = {}
+            for task in pending_tasks:
+                unique_tasks.setdefault(task[1], task)
+            with ThreadPoolExecutor(max_workers=min(8, len(unique_tasks)),
+                                    initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+                outcomes = dict(zip(unique_tasks, executor.map(lambda task: _run_prediction(*task, api_settings, debug_enabled), unique_tasks.values())))
+            
+            # 按任务顺序写回结果
+            for seq_idx, sequence_to_predict, original_sequence in pending_tasks:
+                status, result, task_debug_info = outcomes[sequence_to_predict]
+                ts = time.strftime('%H:%M:%S') if debug_enabled else None
+                first_idx = unique_tasks[sequence_to_predict][0]
+                if seq_idx != first_idx:
+                    result = dict(result, sequence_index=seq_idx)
+                    if status == "success":
+                        result['original_sequence'] = original_sequence
+                    log("[%s] 任务 %d - 序列与任务 %d 相同，复用其预测结果", ts, seq_idx + 1, first_idx + 1)
+                else:
+                    debug_info.extend(task_debug_info)
+                if status == "error":
+                    st.error(result['error'])
+                
+                results[seq_idx] = result
+                statuses[seq_idx] = status
+                log("[%s] 任务 %d - 结果已保存到索引 %s", ts, seq_idx + 1, seq_idx)
+                need_rerun = True
+                progress[seq_idx] = 100
+        
+        # 本轮登记的任务都已进入终态（成功或失败），清空待处理集合
+        pending_indices.clear()
         
-        # 记录任务处理摘要
-        running_count = st.session_state.prediction_status.count("running")
-        success_count = st.session_state.prediction_status.count("success")
-        error_count = st.session_state.prediction_status.count("error")
-        idle_count = st.session_state.prediction_status.count("idle")
+        # 保存调试信息（包含时间戳），处理完成和摘要共用一个时间戳
+        ts = time.strftime('%H:%M:%S') if debug_enabled else None
+        log("[%s] 处理完成，是否需要重新运行: %s", ts, need_rerun)
+        st.session_state.prediction_debug_info = debug_info
         
-        summary = f"[{time.strftime('%H:%M:%S')}] 任务处理摘要: 运行中 {running_count}, 成功 {success_count}, 错误 {error_count}, 空闲 {idle_count}"
-        debug_info.append(summary)
+        # 记录任务处理摘要：一次遍历统计所有状态，只在开启调试时统计
+        if debug_enabled:
+            status_counts = Counter(statuses)
+            log("[%s] 任务处理摘要: 运行中 %d, 成功 %d, 错误 %d, 空闲 %d",
+                ts, status_counts["running"], status_counts["success"],
+                status_counts["error"], status_counts["idle"])
         
         return need_rerun  # 只有在有任务被处理时才返回True
     return False
@@ -1496,7 +1625,7 @@ if process_pending_predictions():
 if 'prediction_debug_info' in st.session_state and st.session_state.prediction_debug_info:
     with st.expander("🔍 预测详细调试信息", expanded=False):
         st.markdown("### 预测处理日志")
-        for line in st.session_state.prediction_debug_info:
+        for line in _format_debug_records(st.session_state.prediction_debug_info):
             st.markdown(f"- {line}")
         # 添加清空调试信息的按钮
         if st.button("清空调试信息"):
@@ -1605,135 +1734,154 @@ st.markdown("""
 
 st.markdown("### 合并所有结构预测结果")
 
+# 合并PDB中依次使用的链标识符 A-Z
+_CHAIN_LABELS = tuple(chr(65 + i) for i in range(26))
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_merged(keys, _contents):
+    """按 (索引, 格式, 内容哈希) 缓存合并后的PDB正文和mmCIF字节内容，结构未变化时重新运行不再重复拼接和编码；
+    没有PDB结构时PDB正文为None。含生成时间的PDB头部由调用方每次生成"""
+    has_pdb = False
+    pdb_chunks = []
+    mmcif_chunks = []
+    # 为每个PDB结构添加链标识符，以避免冲突
+    chain_id = 0
+    for (index, structure_format, _), content in zip(keys, _contents):
+        if structure_format == 'mmcif':
+            mmcif_chunks.append(content)
+            mmcif_chunks.append("\n\n")
+            continue
+        has_pdb = True  # 默认按pdb处理
+        if structure_format == 'pdb':
+            pdb_chunks.append(f"REMARK 结构 {index+1} - 链 {_CHAIN_LABELS[chain_id % 26]}\n")
+            pdb_chunks.append(content)
+            pdb_chunks.append("\n\n")
+            chain_id += 1
+    # 直接返回编码后的字节，下载按钮不必每次重新编码
+    merged_pdb_body = "".join(pdb_chunks).encode('utf-8') if has_pdb else None
+    return merged_pdb_body, "".join(mmcif_chunks).encode('utf-8')
+
+def iter_prediction_results(results):
+    """按序列索引顺序逐个产出非空的预测结果"""
+    return (results[k] for k in sorted(results) if results[k])
+
+@st.fragment
+def render_result(i, result):
+    """渲染单个预测结果的详情和下载按钮；与其交互时只重跑这一个结果"""
+    # 获取序列索引信息
+    seq_index = result.get('sequence_index', i)
+    seq_original = result.get('original_sequence', '未知序列')
+    
+    with st.expander(f"📊 预测结果 {i+1} (序列 {seq_index+1})", expanded=False):
+        # 序列信息
+        st.markdown("### 🧬 序列信息")
+        st.markdown(f"**原始序列**: {seq_original}")
+        if 'sequence' in result:
+            st.markdown(f"**处理后序列**: {result['sequence']}")
+            st.markdown(f"**序列长度**: {len(result['sequence'])} 个氨基酸")
+        
+        # 基本信息
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("### 📊 预测信息")
+            st.markdown(f"**预测置信度**: {result.get('confidence', 'N/A')}")
+            st.markdown(f"**预测时间**: {result.get('time', 'N/A')}")
+            if 'simulation' in result and result['simulation']:
+                st.info("📝 这是模拟数据，仅供演示使用")
+        
+        with col2:
+            # 显示结构质量指标（如果有）
+            if 'metrics' in result and result['metrics']:
+                st.markdown("### 📈 结构质量指标")
+                for metric_name, metric_value in result['metrics'].items():
+                    st.markdown(f"- {_METRIC_DISPLAY.get(metric_name, metric_name)}: {metric_value}")
+        
+        # 提供结构文件下载
+        if 'structure_data' in result and 'content' in result['structure_data'] and result['structure_data']['content']:
+            structure_content = result['structure_data']['content']
+            structure_format = result['structure_data'].get('format', 'pdb')
+            structure_id = result['structure_data'].get('structure_id', f'structure_{seq_index+1}')
+            
+            # 根据格式设置文件扩展名和MIME类型
+            if structure_format == 'mmcif':
+                file_extension = 'cif'
+                mime_type = 'chemical/x-mmcif'
+                label = "💾 下载mmCIF文件"
+            else:  # 默认使用pdb
+                file_extension = 'pdb'
+                mime_type = 'chemical/x-pdb'
+                label = "💾 下载PDB文件"
+            
+            # 创建临时文件以下载
+            st.download_button(
+                label=label,
+                data=structure_content,
+                file_name=f"{structure_id}.{file_extension}",
+                mime=mime_type,
+                key=f"download_structure_{seq_index}"
+            )
+
 # 显示预测结果列表
 if 'prediction_results' in st.session_state:
     results = st.session_state.prediction_results
-    # 过滤掉空结果
-    filtered_results = [res for res in results if res and isinstance(res, dict)]
-    num_results = len(filtered_results)
+    # 只统计非空结果的数量，结果本身在使用处按序列索引顺序逐个取出
+    num_results = sum(1 for result in results.values() if result)
     
     # 显示预测调试信息
     if 'prediction_debug_info' in st.session_state:
         with st.expander("🔍 预测调试信息", expanded=False):
-            st.text("\n".join(st.session_state.prediction_debug_info))
+            st.text("\n".join(_format_debug_records(st.session_state.prediction_debug_info)))
     
     if num_results > 0:
         st.markdown(f"已完成 {num_results} 个蛋白质结构预测")
         
-        # 显示所有结果
-        all_pdb_content = ""
-        all_mmcif_content = ""
-        
-        # 创建一个包含所有结构数据的列表，用于可能的合并显示
+        # 一次遍历：收集所有结构数据用于合并下载，各结果的详情在独立片段中渲染
         all_structures = []
-        
-        for i, result in enumerate(filtered_results):
-            # 获取序列索引信息
-            seq_index = result.get('sequence_index', i)
-            seq_original = result.get('original_sequence', '未知序列')
-            
-            with st.expander(f"📊 预测结果 {i+1} (序列 {seq_index+1})", expanded=False):
-                # 序列信息
-                st.markdown("### 🧬 序列信息")
-                st.markdown(f"**原始序列**: {seq_original}")
-                if 'sequence' in result:
-                    st.markdown(f"**处理后序列**: {result['sequence']}")
-                    st.markdown(f"**序列长度**: {len(result['sequence'])} 个氨基酸")
-                
-                # 基本信息
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown("### 📊 预测信息")
-                    st.markdown(f"**预测置信度**: {result.get('confidence', 'N/A')}")
-                    st.markdown(f"**预测时间**: {result.get('time', 'N/A')}")
-                    if 'simulation' in result and result['simulation']:
-                        st.info("📝 这是模拟数据，仅供演示使用")
-                
-                with col2:
-                    # 显示结构质量指标（如果有）
-                    if 'metrics' in result and result['metrics']:
-                        st.markdown("### 📈 结构质量指标")
-                        for metric_name, metric_value in result['metrics'].items():
-                            metric_display = {
-                                'plddt': 'pLDDT评分',
-                                'tm_score': 'TM-Score',
-                                'rmsd': 'RMSD (Å)',
-                                'total_time_seconds': '总时间 (秒)',
-                                'model_inference_time_seconds': '推理时间 (秒)'
-                            }
-                            st.markdown(f"- {metric_display.get(metric_name, metric_name)}: {metric_value}")
-                
-                # 提供结构文件下载
-                if 'structure_data' in result and 'content' in result['structure_data'] and result['structure_data']['content']:
-                    structure_content = result['structure_data']['content']
-                    structure_format = result['structure_data'].get('format', 'pdb')
-                    structure_id = result['structure_data'].get('structure_id', f'structure_{seq_index+1}')
-                    
-                    # 保存结构信息
-                    all_structures.append({
-                        'content': structure_content,
-                        'format': structure_format,
-                        'id': structure_id,
-                        'index': seq_index
-                    })
-                    
-                    # 根据格式设置文件扩展名和MIME类型
-                    if structure_format.lower() == 'mmcif':
-                        file_extension = 'cif'
-                        mime_type = 'chemical/x-mmcif'
-                        label = "💾 下载mmCIF文件"
-                        all_mmcif_content += structure_content + "\n\n"
-                    else:  # 默认使用pdb
-                        file_extension = 'pdb'
-                        mime_type = 'chemical/x-pdb'
-                        label = "💾 下载PDB文件"
-                        all_pdb_content += structure_content + "\n\n"
-                    
-                    # 创建临时文件以下载
-                    st.download_button(
-                        label=label,
-                        data=structure_content,
-                        file_name=f"{structure_id}.{file_extension}",
-                        mime=mime_type,
-                        key=f"download_structure_{seq_index}"
-                    )
+        for i, result in enumerate(iter_prediction_results(results)):
+            if 'structure_data' in result and 'content' in result['structure_data'] and result['structure_data']['content']:
+                seq_index = result.get('sequence_index', i)
+                structure_content = result['structure_data']['content']
+                all_structures.append({
+                    'content': structure_content,
+                    'format': result['structure_data'].get('format', 'pdb'),
+                    'id': result['structure_data'].get('structure_id', f'structure_{seq_index+1}'),
+                    'index': seq_index,
+                    'sha1': result['structure_data'].get('content_sha1') or hashlib.sha1(structure_content.encode('utf-8')).hexdigest()
+                })
+            render_result(i, result)
         
         # 提供合并后的结构下载
         st.markdown("### 🧬 合并结构下载")
         st.markdown("下载合并后的结构文件，可在外部工具（如PyMOL、UCSF Chimera）中同时查看所有预测结果")
         
         # 根据可用的格式提供合并下载
-        if all_pdb_content:
-            # 尝试简单的PDB合并（在实际应用中可能需要更复杂的合并逻辑）
-            merged_pdb_content = "REMARK 合并的蛋白质结构预测结果\n"
-            merged_pdb_content += f"REMARK 总共 {len(all_structures)} 个结构\n"
-            merged_pdb_content += f"REMARK 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            merged_pdb_content += "\n"
-            
-            # 为每个结构添加链标识符，以避免冲突
-            chain_id = 0
-            for struct in all_structures:
-                if struct['format'].lower() == 'pdb':
-                    # 简单地添加链标识符信息
-                    struct_content = struct['content']
-                    chain_label = chr(65 + (chain_id % 26))  # A, B, C, ...
-                    merged_pdb_content += f"REMARK 结构 {struct['index']+1} - 链 {chain_label}\n"
-                    merged_pdb_content += struct_content + "\n\n"
-                    chain_id += 1
-            
+        # 合并结果按结构内容哈希缓存，结构未变化时直接复用
+        merged_pdb_body, merged_mmcif_content = build_merged(
+            tuple((struct['index'], struct['format'], struct['sha1']) for struct in all_structures),
+            tuple(struct['content'] for struct in all_structures)
+        )
+        now = time.localtime()
+        
+        if merged_pdb_body is not None:
+            # 尝试简单的PDB合并（在实际应用中可能需要更复杂的合并逻辑）；头部含当前时间，不进入缓存
+            header = (
+                "REMARK 合并的蛋白质结构预测结果\n"
+                f"REMARK 总共 {len(all_structures)} 个结构\n"
+                f"REMARK 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S', now)}\n\n"
+            )
             st.download_button(
                 label="💾 下载合并的PDB文件",
-                data=merged_pdb_content,
-                file_name=f"merged_structures_{time.strftime('%Y%m%d_%H%M%S')}.pdb",
+                data=header.encode('utf-8') + merged_pdb_body,
+                file_name=f"merged_structures_{time.strftime('%Y%m%d_%H%M%S', now)}.pdb",
                 mime='chemical/x-pdb',
                 key="download_merged_pdb"
             )
         
-        if all_mmcif_content:
+        if merged_mmcif_content:
             st.download_button(
                 label="💾 下载合并的mmCIF文件",
-                data=all_mmcif_content,
-                file_name=f"merged_structures_{time.strftime('%Y%m%d_%H%M%S')}.cif",
+                data=merged_mmcif_content,
+                file_name=f"merged_structures_{time.strftime('%Y%m%d_%H%M%S', now)}.cif",
                 mime='chemical/x-mmcif',
                 key="download_merged_mmcif"
             )
@@ -1745,14 +1893,6 @@ if 'prediction_results' in st.session_state:
         - 也可上传至 [RCSB 3D Viewer](https://rcsb.org/3d-view) 或 [Mol* Viewer](https://molstar.org/viewer) 在线查看
         - 合并文件中的每个结构都保留了其原始链标识，您可以在查看工具中分别显示或隐藏不同的结构
         """)
-        st.markdown("---")
-        st.markdown("### 💾 下载合并后的PDB文件")
-        st.download_button(
-                label="下载所有结构到单个PDB文件",
-                data=all_pdb_content,
-                file_name=f"merged_structures_{time.strftime('%Y%m%d_%H%M%S')}.pdb",
-                mime='chemical/x-pdb'
-            )
         
         # 蛋白质亲合度计算（模拟）
         st.markdown("---")
@@ -1762,61 +1902,47 @@ if 'prediction_results' in st.session_state:
             st.markdown("#### 亲合度矩阵（基于序列相似性）")
             
             # 计算序列相似性作为亲合度
-            def calculate_similarity(seq1, seq2):
-                """计算两个序列之间的相似性百分比"""
-                min_len = min(len(seq1), len(seq2))
-                max_len = max(len(seq1), len(seq2))
-                
-                if max_len == 0:
-                    return 0.0
-                
-                matches = 0
-                for a, b in zip(seq1[:min_len], seq2[:min_len]):
-                    if a == b:
-                        matches += 1
-                
-                # 计算相似性百分比并归一化到0.5-1.0范围
-                similarity = (matches / max_len) * 0.5 + 0.5  # 0.5-1.0
-                return round(similarity, 2)
+            def calculate_similarity_matrix(sequences):
+                """一次性计算所有序列两两之间的相似性矩阵（0.5-1.0，对角线为1.00）"""
+                lens = np.array([len(seq) for seq in sequences])
+                # 序列编码为字节数组并右侧补0，补位不参与匹配
+                padded = np.zeros((len(sequences), max(lens.max(), 1)), dtype=np.uint8)
+                for row, seq in zip(padded, sequences):
+                    row[:len(seq)] = np.frombuffer(seq.encode('ascii'), dtype=np.uint8)
+                matches = ((padded[:, None, :] == padded[None, :, :]) & (padded[:, None, :] != 0)).sum(-1)
+                max_lens = np.maximum(lens[:, None], lens[None, :])
+                # 计算相似性百分比并归一化到0.5-1.0范围，两条序列都为空时为0
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    similarity = np.where(max_lens > 0, matches / max_lens * 0.5 + 0.5, 0.0)
+                np.fill_diagonal(similarity, 1.0)  # 与自身的亲合度为1.00
+                # 不预先舍入，显示时按两位小数格式化
+                return similarity
             
             # 获取所有序列
-            sequences = [result['sequence'] for result in filtered_results]
+            sequences = [result.get('sequence', '') for result in iter_prediction_results(results)]
             
             # 创建一个N x N的亲合度矩阵
-            affinity_matrix = []
-            for i in range(num_results):
-                row = []
-                for j in range(num_results):
-                    if i == j:
-                        row.append(1.00)  # 与自身的亲合度为1.00
-                    else:
-                        # 计算两个序列之间的相似性
-                        similarity = calculate_similarity(sequences[i], sequences[j])
-                        row.append(similarity)
-                affinity_matrix.append(row)
+            affinity_matrix = calculate_similarity_matrix(sequences)
             
             # 显示亲合度矩阵
             col1, col2 = st.columns(2)
             
             with col1:
-                st.markdown("| 蛋白质 | " + " | ".join([f"蛋白质 {i+1}" for i in range(num_results)]) + " |")
-                st.markdown("|" + "---|" * (num_results + 1))
-                
-                for i, row in enumerate(affinity_matrix):
-                    st.markdown(f"| 蛋白质 {i+1} | " + " | ".join([f"{val:.2f}" for val in row]) + " |")
+                protein_labels = [f"蛋白质 {i+1}" for i in range(num_results)]
+                st.dataframe(
+                    pd.DataFrame(affinity_matrix, index=protein_labels, columns=protein_labels),
+                    column_config={label: st.column_config.NumberColumn(format="%.2f") for label in protein_labels}
+                )
             
             with col2:
                 st.info("📝 提示: 这是基于序列相似性的亲合度数据。实际亲合度需要通过分子对接工具计算。")
                 
-                # 找到最佳结合对
-                best_affinity = 0.0
-                best_pair = (0, 0)
-                
-                for i in range(num_results):
-                    for j in range(i+1, num_results):
-                        if affinity_matrix[i][j] > best_affinity:
-                            best_affinity = affinity_matrix[i][j]
-                            best_pair = (i+1, j+1)
+                # 找到最佳结合对：只看上三角（不含对角线），取第一个最大值
+                # 与原来逐对比较两位小数一致：按舍入后的值取最大，并列时取第一对
+                upper = np.round(np.triu(affinity_matrix, k=1), 2)
+                best_i, best_j = np.unravel_index(upper.argmax(), upper.shape)
+                best_pair = (best_i + 1, best_j + 1)
+                best_affinity = float(upper[best_i, best_j])
 
                 st.markdown(f"**最佳结合对**: 蛋白质 {best_pair[0]} 和 蛋白质 {best_pair[1]}")
                 st.markdown(f"**预测亲合度**: {best_affinity:.2f}")